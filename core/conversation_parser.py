@@ -5,18 +5,27 @@ Handles parsing of conversation files with metadata extraction,
 message processing, and tool use analysis.
 """
 
-import json
 import logging
+import mmap
+import os
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass
 from uuid import uuid4
 
+from core.jsonl import JSONDecodeError, iter_jsonl, loads
+
 logger = logging.getLogger(__name__)
 
+# Lines parse_metadata decodes from each end of a file
+METADATA_SCAN_LINES = 50
 
-@dataclass
+# Bytes per slice when counting lines in a mapped file
+_COUNT_CHUNK = 1 << 20
+
+
+@dataclass(slots=True)
 class ParsedMessage:
     """Represents a parsed message from a conversation."""
     uuid: str
@@ -65,18 +74,16 @@ class JSONLParser:
 
         # Read all lines from JSONL file
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    try:
-                        raw_message = json.loads(line)
-                        raw_messages.append(raw_message)
-                    except json.JSONDecodeError as e:
-                        self.logger.warning(f"Invalid JSON on line {line_num} in {file_path}: {e}")
-                        continue
+            for line_num, line in enumerate(iter_jsonl(file_path), 1):
+                if not line or line.isspace():
+                    continue
+
+                try:
+                    raw_message = loads(line)
+                    raw_messages.append(raw_message)
+                except (JSONDecodeError, UnicodeDecodeError) as e:
+                    self.logger.warning(f"Invalid JSON on line {line_num} in {file_path}: {e}")
+                    continue
         except Exception as e:
             self.logger.error(f"Error reading file {file_path}: {e}")
             raise
@@ -110,6 +117,159 @@ class JSONLParser:
 
         return metadata, messages
 
+    def parse_messages_at(self, file_path: Path, indices: Iterable[int]) -> Tuple[int, Dict[int, ParsedMessage]]:
+        """
+        Parse only the messages at the given indices.
+
+        Returns the session's message count and {index: message} for the
+        requested indices that exist. Every line is still decoded to keep
+        the indices identical to parse_conversation_file's, but only the
+        requested messages are built and nothing else is kept, so memory
+        stays proportional to the request rather than the session.
+        """
+        if not file_path.exists() or not file_path.is_file():
+            raise FileNotFoundError(f"Conversation file not found: {file_path}")
+
+        wanted = set(indices)
+        metadata = self._extract_conversation_metadata(file_path, [])
+        found: Dict[int, ParsedMessage] = {}
+        # Requested messages without a timestamp, waiting for the next one
+        undated: List[int] = []
+        count = 0
+
+        for line in iter_jsonl(file_path):
+            if not line or line.isspace():
+                continue
+            try:
+                raw_message = loads(line)
+            except (JSONDecodeError, UnicodeDecodeError):
+                continue
+            if not isinstance(raw_message, dict):
+                continue
+            if raw_message.get('type') != 'summary' and not isinstance(raw_message.get('message', {}), dict):
+                # _parse_message would reject it
+                continue
+
+            if count in wanted:
+                parsed_msg = self._parse_message(raw_message, metadata)
+                if parsed_msg is None:
+                    continue
+                if parsed_msg.timestamp is not None:
+                    self._date_undated(found, undated, parsed_msg.timestamp)
+                else:
+                    undated.append(count)
+                found[count] = parsed_msg
+            elif undated:
+                timestamp = self._first_timestamp([raw_message])
+                if timestamp is not None:
+                    self._date_undated(found, undated, timestamp)
+            count += 1
+
+        if not count:
+            raise ValueError(f"No valid messages found in {file_path}")
+
+        if undated:
+            # Same fallback as _fix_missing_timestamps
+            self._date_undated(found, undated, datetime.fromtimestamp(file_path.stat().st_mtime))
+        return count, found
+
+    @staticmethod
+    def _date_undated(found: Dict[int, ParsedMessage], undated: List[int], timestamp: datetime) -> None:
+        """Give the waiting undated messages the next known timestamp"""
+        for idx in undated:
+            found[idx].timestamp = timestamp
+        undated.clear()
+
+    def parse_metadata(self, file_path: Path) -> ConversationMetadata:
+        """
+        Read session metadata without parsing the whole file.
+
+        Only the first and last METADATA_SCAN_LINES lines are JSON-decoded:
+        git branch and working directory come from the head (as in
+        _extract_conversation_metadata), started_at/ended_at from the first
+        and last timestamped lines, and message_count is the number of
+        lines that start a JSON object. Session files are appended in
+        order, so this matches parse_conversation_file except for files with
+        malformed objects or out-of-order timestamps.
+        """
+        if not file_path.exists() or not file_path.is_file():
+            raise FileNotFoundError(f"Conversation file not found: {file_path}")
+
+        with open(file_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                raise ValueError(f"No valid messages found in {file_path}")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                message_count = self._count_messages(buf)
+                head = self._decode_lines(buf, reverse=False)
+                tail = self._decode_lines(buf, reverse=True)
+
+        if not head:
+            raise ValueError(f"No valid messages found in {file_path}")
+
+        metadata = self._extract_conversation_metadata(file_path, head)
+        metadata.message_count = message_count
+        metadata.started_at = self._first_timestamp(head)
+        metadata.ended_at = self._first_timestamp(tail)
+        if metadata.started_at is None or metadata.ended_at is None:
+            # Same fallback as _fix_missing_timestamps
+            file_mtime = datetime.fromtimestamp(stat.st_mtime)
+            metadata.started_at = metadata.started_at or file_mtime
+            metadata.ended_at = metadata.ended_at or file_mtime
+        return metadata
+
+    @staticmethod
+    def _count_messages(buf: mmap.mmap) -> int:
+        """
+        Number of lines in buf that start a JSON object.
+
+        Blank and non-JSON lines are skipped as parse_conversation_file
+        skips them; each slice reaches one byte past its chunk so a match
+        straddling the boundary is counted exactly once.
+        """
+        count = sum(buf[pos:pos + _COUNT_CHUNK + 1].count(b'\n{') for pos in range(0, len(buf), _COUNT_CHUNK))
+        return count + (buf[:1] == b'{')
+
+    @staticmethod
+    def _decode_lines(buf: mmap.mmap, reverse: bool) -> List[Dict]:
+        """Decode up to METADATA_SCAN_LINES JSON objects from the start (or end) of buf"""
+        decoded = []
+        pos, end = 0, len(buf)
+        for _ in range(METADATA_SCAN_LINES):
+            if reverse:
+                if end <= 0:
+                    break
+                start = buf.rfind(b'\n', 0, end) + 1
+                line, end = buf[start:end], start - 1
+            else:
+                if pos >= end:
+                    break
+                nl = buf.find(b'\n', pos)
+                if nl < 0:
+                    nl = end
+                line, pos = buf[pos:nl], nl + 1
+            if not line or line.isspace():
+                continue
+            try:
+                raw_message = loads(line)
+            except (JSONDecodeError, UnicodeDecodeError):
+                continue
+            if isinstance(raw_message, dict):
+                decoded.append(raw_message)
+        return decoded
+
+    @staticmethod
+    def _first_timestamp(raw_messages: List[Dict]) -> Optional[datetime]:
+        """First parseable timestamp in raw_messages"""
+        for raw_msg in raw_messages:
+            value = raw_msg.get('timestamp')
+            if value:
+                try:
+                    return datetime.fromisoformat(value)
+                except (ValueError, TypeError):
+                    continue
+        return None
+
     def _extract_conversation_metadata(self, file_path: Path, raw_messages: List[Dict]) -> ConversationMetadata:
         """Extract metadata from conversation file and messages."""
         # Project information from file path
@@ -160,8 +320,8 @@ class JSONLParser:
             timestamp = None
             if 'timestamp' in raw_msg and raw_msg['timestamp']:
                 try:
-                    # Handle ISO format timestamp
-                    timestamp = datetime.fromisoformat(raw_msg['timestamp'].replace('Z', '+00:00'))
+                    # Handle ISO format timestamp (fromisoformat accepts a trailing 'Z' on 3.11+)
+                    timestamp = datetime.fromisoformat(raw_msg['timestamp'])
                 except (ValueError, TypeError) as e:
                     self.logger.debug(f"Could not parse timestamp '{raw_msg.get('timestamp')}': {e}")
             elif msg_type == 'summary' and metadata.started_at:
@@ -425,4 +585,4 @@ if __name__ == "__main__":
             print(f"Conversations: {len(conversations)}")
             print(f"Messages: {len(messages)}")
     else:
-        print("Usage: python conversation_parser.py <file_or_directory>")
\ No newline at end of file
+        print("Usage: python -m core.conversation_parser <file_or_directory>")
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Persistent SQLite FTS5 index of conversation messages.
+
+The index is a candidate filter for search_conversations: it answers
+"which session files can contain this literal?" without re-reading every
+JSONL file. Exact matching (case sensitivity, role and time filters,
+context windows) still happens on the parsed messages, so results are
+identical with or without the index.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Trigram MATCH needs at least three characters to use the index
+MIN_QUERY_LENGTH = 3
+
+# Bump when the schema or fold_text() changes; older databases are rebuilt
+_SCHEMA_VERSION = 2
+
+IndexRow = Tuple[int, str, Optional[float], str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    role TEXT,
+    ts REAL,
+    folded TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_path ON messages(path, idx);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages(ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    folded, content='messages', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, folded) VALUES (new.id, new.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, folded) VALUES ('delete', old.id, old.folded);
+END;
+"""
+
+_DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS messages_ai;
+DROP TRIGGER IF EXISTS messages_ad;
+DROP TABLE IF EXISTS messages_fts;
+DROP TABLE IF EXISTS messages;
+DROP TABLE IF EXISTS files;
+"""
+
+
+def default_cache_dir() -> Path:
+    """Directory for on-disk caches (honours XDG_CACHE_HOME)"""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'cc-session-search'
+
+
+def fold_text(text: str) -> str:
+    """
+    Normalize text for the index.
+
+    Anything the searcher's matching finds must still be a substring after
+    folding, otherwise the index would drop real matches; the searcher
+    casefolds case-insensitive queries the same way.
+    """
+    return text.casefold()
+
+
+def timestamp_key(timestamp: Optional[datetime]) -> Optional[float]:
+    """Epoch seconds for a message timestamp; naive values are treated as UTC like the searcher does"""
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class MessageIndex:
+    """SQLite FTS5 (trigram) index over message contents, refreshed by file mtime"""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path or default_cache_dir() / 'index.db'
+        self.logger = logging.getLogger(__name__)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database lazily; disable the index if SQLite lacks FTS5/trigram"""
+        if self._conn is not None or self._disabled:
+            return self._conn
+
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != _SCHEMA_VERSION:
+                conn.executescript(_DROP_SCHEMA)
+            conn.executescript(_SCHEMA)
+            conn.execute(f'PRAGMA user_version={_SCHEMA_VERSION}')
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"Search index unavailable ({self.db_path}): {e}")
+            self._disabled = True
+
+        return self._conn
+
+    def sync(self, session_files: Iterable[Path],
+             build_rows: Callable[[List[Path]], Iterable[Optional[List[IndexRow]]]]) -> bool:
+        """
+        Re-ingest session files whose mtime or size changed since the last sync.
+
+        build_rows receives the stale files and yields, in order, the
+        (idx, role, ts, folded) rows for each one (None if it failed to parse).
+        A file that failed is recorded with no rows, so it is only retried
+        once its mtime or size changes. Returns False if the index is
+        unavailable.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return False
+
+            try:
+                known = {}
+                stale = []
+                for path_str, mtime_ns, size in conn.execute('SELECT path, mtime_ns, size FROM files'):
+                    known[path_str] = (mtime_ns, size)
+
+                for session_file in session_files:
+                    try:
+                        stat = session_file.stat()
+                    except OSError:
+                        continue
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                    if known.get(str(session_file)) != signature:
+                        stale.append((session_file, signature))
+
+                if not stale:
+                    return True
+
+                with conn:
+                    for (session_file, signature), rows in zip(stale, build_rows([f for f, _ in stale])):
+                        path_str = str(session_file)
+                        conn.execute('DELETE FROM messages WHERE path = ?', (path_str,))
+                        if rows is not None:
+                            conn.executemany(
+                                'INSERT INTO messages(path, idx, role, ts, folded) VALUES (?, ?, ?, ?, ?)',
+                                ((path_str, idx, role, ts, folded) for idx, role, ts, folded in rows)
+                            )
+                        conn.execute(
+                            'INSERT OR REPLACE INTO files(path, mtime_ns, size) VALUES (?, ?, ?)',
+                            (path_str, signature[0], signature[1])
+                        )
+                return True
+            except sqlite3.Error as e:
+                self.logger.warning(f"Search index sync failed: {e}")
+                return False
+
+    def candidate_files(self, query: str,
+                        roles: Optional[Iterable[str]] = None,
+                        start_ts: Optional[float] = None,
+                        end_ts: Optional[float] = None) -> Optional[Set[str]]:
+        """
+        Paths of indexed files with at least one message that may match.
+
+        Returns None when the index can't answer (query too short, index
+        unavailable), in which case callers must scan every file.
+        """
+        folded_query = fold_text(query)
+        if len(folded_query) < MIN_QUERY_LENGTH:
+            return None
+
+        sql = ['SELECT DISTINCT m.path FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid',
+               'WHERE messages_fts MATCH ?']
+        params: list = ['"' + folded_query.replace('"', '""') + '"']
+        return self._query_paths(sql, params, roles, start_ts, end_ts)
+
+    def files_in_range(self,
+                       roles: Optional[Iterable[str]] = None,
+                       start_ts: Optional[float] = None,
+                       end_ts: Optional[float] = None) -> Optional[Set[str]]:
+        """Paths of indexed files with at least one message in the role/time range (no text match)"""
+        return self._query_paths(['SELECT DISTINCT m.path FROM messages m WHERE 1'], [], roles, start_ts, end_ts)
+
+    def _query_paths(self, sql: List[str], params: list,
+                     roles: Optional[Iterable[str]],
+                     start_ts: Optional[float],
+                     end_ts: Optional[float]) -> Optional[Set[str]]:
+        """Run a path query with the shared role/time filters; None if the index can't answer"""
+        if roles is not None:
+            roles = list(roles)
+            sql.append(f"AND m.role IN ({', '.join('?' for _ in roles)})")
+            params.extend(roles)
+        if start_ts is not None:
+            sql.append('AND m.ts >= ?')
+            params.append(start_ts)
+        if end_ts is not None:
+            sql.append('AND m.ts <= ?')
+            params.append(end_ts)
+
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                return {row[0] for row in conn.execute(' '.join(sql), params)}
+            except sqlite3.Error as e:
+                self.logger.warning(f"Search index query failed: {e}")
+                return None
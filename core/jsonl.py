@@ -0,0 +1,85 @@
+"""
+Fast JSON helpers shared by the parser and searcher.
+
+Uses orjson when it is installed and falls back to the stdlib json module
+otherwise, so the server keeps working with only its required dependencies.
+"""
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Indent tool responses for reading by hand; MCP clients don't need it
+PRETTY = os.environ.get('CC_SEARCH_PRETTY', '') not in ('', '0')
+
+if orjson is not None:
+    JSONDecodeError = orjson.JSONDecodeError
+    loads = orjson.loads
+else:
+    JSONDecodeError = json.JSONDecodeError
+    loads = json.loads
+
+
+def dumps(obj: Any, pretty: Optional[bool] = None) -> str:
+    """
+    Serialize a tool response as JSON text: compact, or indented by two
+    spaces when pretty is set (by default, when CC_SEARCH_PRETTY is set).
+
+    Non-ASCII characters are written as UTF-8 rather than \\u escapes, which
+    are up to six times longer. orjson rejects a few inputs the stdlib
+    accepts (lone surrogates, big ints), so those fall back to json.dumps;
+    lone surrogates can't be encoded as UTF-8 and stay escaped.
+    """
+    if pretty is None:
+        pretty = PRETTY
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode('utf-8')
+        except TypeError:
+            pass
+    options = {'indent': 2} if pretty else {'separators': (',', ':')}
+    text = json.dumps(obj, ensure_ascii=False, **options)
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        text = json.dumps(obj, **options)
+    return text
+
+
+def iter_jsonl(path: Union[str, Path]) -> Iterator[bytes]:
+    """
+    Yield the raw lines of a JSONL file as bytes.
+
+    The file is memory-mapped and split with ``find(b'\\n')`` so no per-line
+    str decoding or strip() copies are made before the JSON decoder sees the
+    data. Every line is yielded (including blank ones) so callers can keep
+    accurate line numbers; both loads() implementations accept bytes.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses to map empty files
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = 0
+            end = len(buf)
+            while pos < end:
+                nl = buf.find(b'\n', pos)
+                if nl < 0:
+                    nl = end
+                yield buf[pos:nl]
+                pos = nl + 1
+
+
+def file_contains(path: Union[str, Path], needle: bytes) -> bool:
+    """Whether the raw bytes of a file contain needle, found with mmap.find()"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return buf.find(needle) >= 0
@@ -3,13 +3,13 @@ Data models for conversation search
 """
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-import json
+from typing import Optional, List, Dict, Any, NamedTuple, Union
 
+from core.jsonl import JSONDecodeError, loads
 
-@dataclass
-class Message:
-    """Represents a single message in a conversation"""
+
+class Message(NamedTuple):
+    """Represents a single message in a conversation (read-only, tuple-backed)"""
     role: str
     content: str
     timestamp: Optional[datetime] = None
@@ -17,10 +17,10 @@ class Message:
     tool_calls: Optional[List[Dict[str, Any]]] = None
 
     @classmethod
-    def from_jsonl_line(cls, line: str) -> Optional['Message']:
+    def from_jsonl_line(cls, line: Union[str, bytes]) -> Optional['Message']:
         """Parse a message from a JSONL line"""
         try:
-            data = json.loads(line.strip())
+            data = loads(line)
 
             # Extract message content based on structure
             message_data = data.get('message', {})
@@ -41,8 +41,8 @@ class Message:
             timestamp = None
             if 'timestamp' in data:
                 try:
-                    timestamp = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
+                    timestamp = datetime.fromisoformat(data['timestamp'])
+                except (ValueError, TypeError):
                     pass
 
             # Extract UUID
@@ -54,15 +54,9 @@ class Message:
                 tool_calls = [block for block in message_data['content']
                             if block.get('type') == 'tool_use']
 
-            return cls(
-                role=role,
-                content=content,
-                timestamp=timestamp,
-                uuid=uuid,
-                tool_calls=tool_calls
-            )
+            return cls(role, content, timestamp, uuid, tool_calls)
 
-        except (json.JSONDecodeError, KeyError):
+        except (JSONDecodeError, KeyError):
             return None
 
 
@@ -77,7 +71,7 @@ class SearchResult:
     context_window: List[Dict[str, Any]]
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationSummary:
     """Represents a summarized view of daily conversations"""
     date: str
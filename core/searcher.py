@@ -1,12 +1,241 @@
 """
 Core conversation search functionality
 """
+import multiprocessing
+import os
 import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple, Union
 
+from core.conversation_parser import ConversationMetadata, JSONLParser, ParsedMessage
+from core.index import MIN_QUERY_LENGTH, IndexRow, MessageIndex, fold_text, timestamp_key
+from core.jsonl import file_contains
 from core.models import Message
+from core.session_cache import SessionCache
+
+try:
+    import hyperscan
+except ImportError:  # optional speedup
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:  # optional: linear-time regex searches
+    re2 = None
+
+# Maximum number of message records analyze_sessions returns
+_ANALYZE_LIMIT = 100
+
+# Parsed sessions kept in the server process (see _parse_session_file)
+_PARSE_CACHE_SIZE = 256
+_parse_cache: 'OrderedDict[Tuple[str, int, int], Tuple[ConversationMetadata, List[ParsedMessage]]]' = OrderedDict()
+# Tool calls run on worker threads (see server.call_tool)
+_parse_cache_lock = threading.Lock()
+# Keys of sessions pool workers loaded (so their on-disk sidecars are
+# current), which the server can load inline instead of pooling again
+_SIDECAR_KEYS_SIZE = 4096
+_sidecar_keys: 'OrderedDict[Tuple[str, int, int], None]' = OrderedDict()
+# Keys a pool worker loaded for its current task (see _pool_task)
+_worker_loaded: List[Tuple[str, int, int]] = []
+
+# Worker pool for _iter_session_files (see _get_pool)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Seconds discover_projects reuses its last listing while no directory changed
+PROJECTS_TTL = 5.0
+
+# Roles kept by each role_filter; "both" keeps every role and has no entry
+_ROLE_FILTERS = {
+    'user': frozenset({'user'}),
+    'assistant': frozenset({'assistant'}),
+    'tool': frozenset({'tool'}),
+}
+
+
+class _LiteralMatcher:
+    """
+    Finds which messages of a session contain a literal query.
+
+    Message contents are joined into one buffer with a NUL separator and
+    scanned in a single pass; match offsets are mapped back to the owning
+    message with bisect over the start offsets. Hyperscan is used when it is
+    installed, otherwise str.find scans the joined buffer. Case-insensitive
+    matching casefolds the contents once (the same folding as the search
+    index) and looks for the casefolded query, on both paths; Hyperscan's
+    own CASELESS flag only does simple case folding (it would not match
+    "STRASSE" to "straße").
+
+    raw_needle, when not None, is a byte string every session file with a
+    match must contain verbatim, so files without it can be skipped
+    before they are parsed.
+    """
+
+    SEPARATOR = '\x00'
+
+    # Spelled differently in the JSON than in str() of a non-text content block
+    _PYTHON_LITERALS = ('True', 'False', 'None', 'inf', 'nan')
+
+    def __init__(self, query: str, case_sensitive: bool):
+        self.case_sensitive = case_sensitive
+        self.needle = query if case_sensitive else query.casefold()
+        self.raw_needle = self._raw_needle(query) if case_sensitive else None
+        self.db = None
+
+        if hyperscan is not None and query:
+            hs_flags = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+            try:
+                db = hyperscan.Database()
+                db.compile(expressions=[re.escape(self.needle).encode('utf-8')], flags=[hs_flags])
+                self.db = db
+            except Exception:
+                # Fall back to the str.find scan for patterns hyperscan rejects
+                self.db = None
+
+    @classmethod
+    def _raw_needle(cls, query: str) -> Optional[bytes]:
+        """
+        The query as it must appear in the JSONL bytes of a matching file,
+        or None if the parser could have produced it some other way.
+
+        Printable ASCII without quotes or backslashes is written verbatim
+        by JSON encoders; newlines would match across joined content blocks.
+        Digits are excluded too: a numeric content value is str()-rendered
+        by the parser (1e5 becomes "100000.0"), not copied from the file.
+        Case-insensitive queries are never prefiltered: casefolding maps
+        some non-ASCII characters (e.g. the Kelvin sign) onto ASCII letters.
+        """
+        if not query or not query.isascii() or not query.isprintable():
+            return None
+        if any(c in query for c in '"\'\\') or any(c.isdigit() for c in query):
+            return None
+        if any(word in query for word in cls._PYTHON_LITERALS):
+            return None
+        return query.encode('ascii')
+
+    def matching_indices(self, contents: List[str]) -> List[int]:
+        """Return the sorted indices of contents that contain the query"""
+        if not contents:
+            return []
+        if self.db is not None:
+            return self._scan_hyperscan(contents)
+
+        buf = self.SEPARATOR.join(contents)
+        if not self.case_sensitive:
+            folded = buf.casefold()
+            if len(folded) == len(buf):
+                # casefold() never shortens a character, so equal totals mean every
+                # message kept its length and the original offsets still apply
+                buf = folded
+            else:
+                contents = [content.casefold() for content in contents]
+                buf = self.SEPARATOR.join(contents)
+
+        needle = self.needle
+        pos = buf.find(needle)
+        if pos < 0:
+            # Common case: no hit, so the offsets are never built
+            return []
+
+        offsets = []
+        start = 0
+        for content in contents:
+            offsets.append(start)
+            start += len(content) + 1
+
+        matched = []
+        last = len(offsets) - 1
+        while pos >= 0:
+            idx = bisect_right(offsets, pos) - 1
+            matched.append(idx)
+            if idx >= last:
+                break
+            # Skip the rest of this message; one hit is enough
+            pos = buf.find(needle, offsets[idx + 1])
+        return matched
+
+    def positions(self, content: str) -> List[int]:
+        """
+        Offsets of every non-overlapping occurrence of the query in content.
+
+        For case-insensitive queries the offsets index the casefolded
+        content, which is the same string length in all but a few scripts.
+        """
+        needle = self.needle
+        if not needle:
+            return []
+        haystack = content if self.case_sensitive else content.casefold()
+        step = len(needle)
+        positions = []
+        pos = haystack.find(needle)
+        while pos >= 0:
+            positions.append(pos)
+            pos = haystack.find(needle, pos + step)
+        return positions
+
+    def _scan_hyperscan(self, contents: List[str]) -> List[int]:
+        if not self.case_sensitive:
+            contents = [content.casefold() for content in contents]
+        encoded = [content.encode('utf-8', 'surrogatepass') for content in contents]
+        offsets = []
+        pos = 0
+        for chunk in encoded:
+            offsets.append(pos)
+            pos += len(chunk) + 1
+        buf = b'\x00'.join(encoded)
+
+        matched = set()
+
+        def on_match(_id, _start, end, _flags, _context):
+            matched.add(bisect_right(offsets, end - 1) - 1)
+
+        self.db.scan(buf, match_event_handler=on_match)
+        return sorted(matched)
+
+
+class _RegexMatcher:
+    """
+    Matcher for search_conversations(regex=True), with the same interface
+    as _LiteralMatcher.
+
+    Messages are searched one at a time: a pattern like 'a.*b' would
+    otherwise match across the separator of a joined buffer. RE2 is used
+    when it is installed, so a pathological pattern can't backtrack for
+    minutes over a large tool output; patterns RE2 doesn't support
+    (backreferences, lookaround) fall back to the re module.
+    """
+
+    # A pattern gives no literal for the raw-bytes prefilter
+    raw_needle = None
+
+    def __init__(self, query: str, case_sensitive: bool):
+        self.pattern = None
+        if re2 is not None:
+            try:
+                self.pattern = re2.compile(query if case_sensitive else '(?i)' + query)
+            except Exception:
+                self.pattern = None
+        if self.pattern is None:
+            self.pattern = re.compile(query, 0 if case_sensitive else re.IGNORECASE)
+
+    def matching_indices(self, contents: List[str]) -> List[int]:
+        """Return the sorted indices of contents the pattern matches"""
+        search = self.pattern.search
+        return [i for i, content in enumerate(contents) if search(content)]
+
+    def positions(self, content: str) -> List[int]:
+        """Offsets of every non-overlapping match of the pattern in content"""
+        return [match.start() for match in self.pattern.finditer(content)]
 
 
 class SessionSearcher:
@@ -14,95 +243,237 @@ class SessionSearcher:
 
     def __init__(self):
         # Use local conversation parser
-        from core.conversation_parser import JSONLParser
         self.parser = JSONLParser()
 
         self.claude_dir = Path.home() / '.claude' / 'projects'
 
-    def discover_projects(self) -> List[Dict[str, Any]]:
-        """Discover all Claude Code projects"""
-        projects = []
+        # Persistent FTS5 index used to skip files that can't match a query
+        self.index = MessageIndex()
 
-        if not self.claude_dir.exists():
-            return projects
+        # In-memory manifest of project directories and their session files,
+        # re-listed only when a directory's mtime changes (see _refresh_manifest)
+        self._manifest_mtime = 0
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        # session_id -> file path, rebuilt whenever the manifest changes
+        self._session_index: Dict[str, Path] = {}
+        # Tool calls run on worker threads, so refreshes must not interleave
+        self._manifest_lock = threading.Lock()
+        # Bumped whenever the manifest changes; keys the discover_projects memo
+        self._manifest_version = 0
+        self._projects_memo: Optional[Tuple[int, float, List[Dict[str, Any]]]] = None
 
-        for project_dir in self.claude_dir.iterdir():
-            if not project_dir.is_dir():
-                continue
+    def _refresh_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Bring the project -> session file manifest up to date and return it.
 
-            # Count sessions
-            session_files = list(project_dir.glob('*.jsonl'))
-            if not session_files:
+        Creating or deleting an entry bumps its parent directory's mtime, so the
+        root is only re-listed when its own mtime changes and each project only
+        when the project directory's mtime changes. Appending to a session does
+        not touch the directory, so callers still stat files and compare the
+        cached (mtime_ns, size) signature before trusting cached session info.
+        """
+        with self._manifest_lock:
+            return self._refresh_manifest_locked()
+
+    def _refresh_manifest_locked(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            root_mtime = self.claude_dir.stat().st_mtime_ns
+        except OSError:
+            self._manifest_mtime = 0
+            self._manifest = {}
+            self._session_index = {}
+            self._manifest_version += 1
+            return self._manifest
+
+        changed = root_mtime != self._manifest_mtime
+        if changed:
+            projects = {}
+            with os.scandir(self.claude_dir) as project_entries:
+                for project_entry in project_entries:
+                    if project_entry.is_dir():
+                        projects[project_entry.name] = self._manifest.get(project_entry.name) or {
+                            'path': project_entry.path,
+                            'mtime_ns': None,
+                            'files': {}
+                        }
+            self._manifest = projects
+            self._manifest_mtime = root_mtime
+
+        for project in self._manifest.values():
+            try:
+                project_mtime = os.stat(project['path']).st_mtime_ns
+            except OSError:
+                changed = changed or bool(project['files'])
+                project['files'] = {}
+                continue
+            if project_mtime == project['mtime_ns']:
                 continue
+            # Keep cached session info for files that are still present
+            cached = project['files']
+            project['files'] = {entry.name: cached.get(entry.name) for entry in _scandir_jsonl(project['path'])}
+            project['mtime_ns'] = project_mtime
+            changed = True
 
-            # Get project info
-            latest_session = max(session_files, key=lambda f: f.stat().st_mtime)
-            latest_time = datetime.fromtimestamp(latest_session.stat().st_mtime)
+        if changed:
+            session_index = {}
+            for project in self._manifest.values():
+                for file_name in project['files']:
+                    # First project wins, matching the old directory-order scan
+                    session_index.setdefault(file_name[:-len('.jsonl')], Path(project['path']) / file_name)
+            self._session_index = session_index
+            self._manifest_version += 1
 
-            projects.append({
-                'name': project_dir.name,
-                'path': str(project_dir),
-                'session_count': len(session_files),
-                'latest_activity': latest_time.isoformat(),
-                'decoded_name': self._decode_project_name(project_dir.name)
-            })
+        return self._manifest
+
+    def _find_session_file(self, session_id: str) -> Optional[Path]:
+        """Locate a session file by id; refresh the manifest only on a miss"""
+        session_file = self._session_index.get(session_id)
+        if session_file is None:
+            self._refresh_manifest()
+            session_file = self._session_index.get(session_id)
+        return session_file
+
+    def discover_projects(self) -> List[Dict[str, Any]]:
+        """
+        Discover all Claude Code projects.
+
+        Appending to a session doesn't change any directory mtime, so the
+        listing is memoized for PROJECTS_TTL seconds on top of the manifest
+        version rather than indefinitely: back-to-back calls skip restating
+        every session file, and latest_activity is at most that stale.
+        """
+        manifest = self._refresh_manifest()
+        version = self._manifest_version
+        memo = self._projects_memo
+        if memo is not None and memo[0] == version and time.monotonic() - memo[1] < PROJECTS_TTL:
+            return [dict(project_info) for project_info in memo[2]]
+
+        projects = []
+        for project_name, project in manifest.items():
+            # Count sessions and track the latest mtime inline; each file is stat'd once
+            session_count = 0
+            latest_mtime = 0.0
+            for file_name in project['files']:
+                try:
+                    mtime = os.stat(os.path.join(project['path'], file_name)).st_mtime
+                except OSError:
+                    continue
+                session_count += 1
+                if mtime > latest_mtime:
+                    latest_mtime = mtime
+
+            if not session_count:
+                continue
 
-        return sorted(projects, key=lambda p: p['latest_activity'], reverse=True)
+            projects.append((latest_mtime, {
+                'name': project_name,
+                'path': project['path'],
+                'session_count': session_count,
+                'latest_activity': datetime.fromtimestamp(latest_mtime).isoformat(),
+                'decoded_name': self._decode_project_name(project_name)
+            }))
 
-    def _decode_project_name(self, encoded_name: str) -> str:
+        # Sort on the raw mtime floats rather than the formatted strings
+        projects.sort(key=itemgetter(0), reverse=True)
+        listing = [project_info for _, project_info in projects]
+        self._projects_memo = (version, time.monotonic(), listing)
+        return [dict(project_info) for project_info in listing]
+
+    @staticmethod
+    def _decode_project_name(encoded_name: str) -> str:
         """Decode Claude project directory names"""
         return encoded_name.replace('-', '/')
 
     def get_sessions_for_project(self, project_name: str, days_back: int = 7) -> List[Dict[str, Any]]:
         """Get sessions for a specific project"""
-        project_dir = self.claude_dir / project_name
-        if not project_dir.exists():
+        project = self._refresh_manifest().get(project_name)
+        if project is None:
             return []
 
-        cutoff_time = datetime.now() - timedelta(days=days_back)
-        sessions = []
+        sessions = [dict(session_info) for session_info in self._iter_project_sessions(project, days_back)]
+        return sorted(sessions, key=_session_sort_key, reverse=True)
 
-        for session_file in project_dir.glob('*.jsonl'):
-            mod_time = datetime.fromtimestamp(session_file.stat().st_mtime)
-            if mod_time < cutoff_time:
-                continue
+    def _iter_project_sessions(self, project: Dict[str, Any], days_back: int) -> Iterator[Dict[str, Any]]:
+        """Cached session info of a manifest project's files modified in the last days_back days"""
+        # Compare raw st_mtime floats so rejected files never allocate a datetime
+        cutoff_ts = (datetime.now() - timedelta(days=days_back)).timestamp()
 
+        project_path = project['path']
+        # Iterate a snapshot: another thread's manifest refresh may replace
+        # or rewrite the files dict while session info is being parsed
+        for file_name, cached in list(project['files'].items()):
+            # One os.stat per listed file; a Path is only built for files in the window
+            file_path = os.path.join(project_path, file_name)
             try:
-                # Quick parse for metadata
-                conversation_metadata, messages = self.parser.parse_conversation_file(session_file)
-
-                sessions.append({
-                    'session_id': conversation_metadata.session_id,
-                    'file_path': str(session_file),
-                    'message_count': len(messages),
-                    'started_at': conversation_metadata.started_at.isoformat() if conversation_metadata.started_at else None,
-                    'ended_at': conversation_metadata.ended_at.isoformat() if conversation_metadata.ended_at else None,
-                    'working_directory': conversation_metadata.working_directory,
-                    'git_branch': conversation_metadata.git_branch
-                })
-            except Exception:
-                # Skip corrupted files
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if stat.st_mtime < cutoff_ts:
                 continue
 
-        return sorted(sessions, key=lambda s: s['started_at'] or '1970-01-01', reverse=True)
+            # Reuse the cached session info while the file is unchanged
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if cached is not None and cached[0] == signature:
+                session_info = cached[1]
+            else:
+                session_info = self._session_info(Path(file_path))
+                with self._manifest_lock:
+                    files = project['files']
+                    # Don't re-add a file a concurrent refresh has dropped
+                    if file_name in files:
+                        files[file_name] = (signature, session_info)
+
+            if session_info is not None:
+                yield session_info
+
+    def _session_info(self, session_file: Path) -> Optional[Dict[str, Any]]:
+        """Session listing entry for one file, or None if it can't be parsed"""
+        try:
+            # Head/tail read only; message bodies are parsed by the callers that need them
+            conversation_metadata = _get_parser().parse_metadata(session_file)
+        except Exception:
+            # Skip corrupted files
+            return None
+
+        return {
+            'session_id': conversation_metadata.session_id,
+            'file_path': str(session_file),
+            'message_count': conversation_metadata.message_count,
+            'started_at': conversation_metadata.started_at.isoformat() if conversation_metadata.started_at else None,
+            'ended_at': conversation_metadata.ended_at.isoformat() if conversation_metadata.ended_at else None,
+            'working_directory': conversation_metadata.working_directory,
+            'git_branch': conversation_metadata.git_branch
+        }
 
     def get_recent_sessions(self, days_back: int = 7, project_filter: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get recent sessions across all or specific projects"""
         all_sessions = []
 
-        projects_to_search = [self.claude_dir / project_filter] if project_filter else self.claude_dir.iterdir()
-
-        for project_dir in projects_to_search:
-            if not project_dir.is_dir():
-                continue
+        projects_to_search = [project_filter] if project_filter else list(self._refresh_manifest())
 
-            project_sessions = self.get_sessions_for_project(project_dir.name, days_back)
+        for project_name in projects_to_search:
+            project_sessions = self.get_sessions_for_project(project_name, days_back)
             for session in project_sessions:
-                session['project_name'] = project_dir.name
-                session['project_decoded'] = self._decode_project_name(project_dir.name)
+                session['project_name'] = project_name
+                session['project_decoded'] = self._decode_project_name(project_name)
                 all_sessions.append(session)
 
-        return sorted(all_sessions, key=lambda s: s['started_at'] or '1970-01-01', reverse=True)
+        return sorted(all_sessions, key=_session_sort_key, reverse=True)
+
+    def _recent_paths(self, days_back: int, project_filter: Optional[str] = None) -> List[Path]:
+        """
+        Session files of get_recent_sessions(days_back, project_filter), in
+        the same newest-first order, without building the listing dicts.
+        """
+        manifest = self._refresh_manifest()
+        project_names = [project_filter] if project_filter else list(manifest)
+        sessions = []
+        for project_name in project_names:
+            project = manifest.get(project_name)
+            if project is not None:
+                sessions.extend(self._iter_project_sessions(project, days_back))
+        sessions.sort(key=_session_sort_key, reverse=True)
+        return [Path(session_info['file_path']) for session_info in sessions]
 
     def analyze_sessions(self,
                         session_ids: List[str] = None,
@@ -115,70 +486,55 @@ class SessionSearcher:
         # Get sessions to analyze
         if session_ids:
             sessions_to_analyze = []
-            for project_dir in self.claude_dir.iterdir():
-                if project_filter and project_dir.name != project_filter:
+            for project_name, project in self._refresh_manifest().items():
+                if project_filter and project_name != project_filter:
                     continue
                 for session_id in session_ids:
-                    session_file = project_dir / f"{session_id}.jsonl"
-                    if session_file.exists():
-                        sessions_to_analyze.append(session_file)
+                    file_name = f"{session_id}.jsonl"
+                    if file_name in project['files']:
+                        sessions_to_analyze.append(Path(project['path']) / file_name)
         else:
             # Get recent sessions
-            recent_sessions = self.get_recent_sessions(days_back, project_filter)
-            sessions_to_analyze = [Path(s['file_path']) for s in recent_sessions]
+            sessions_to_analyze = self._recent_paths(days_back, project_filter)
 
-        # Parse and filter messages
-        all_messages = []
+        # Parse and filter messages, one file per worker process. Workers return
+        # role counts and the total content length of the kept messages plus at
+        # most _ANALYZE_LIMIT metadata dicts, which is all the response can show.
+        kept = []
+        role_counts = Counter()
+        total_length = 0
+        sessions_with_messages = {}  # insertion-ordered, capped at 10
         session_count = 0
 
-        for session_file in sessions_to_analyze:
-            try:
-                conversation_metadata, messages = self.parser.parse_conversation_file(session_file)
-                session_count += 1
-
-                # Filter by role
-                filtered_messages = []
-                for msg in messages:
-                    if role_filter == "user" and msg.role != "user":
-                        continue
-                    elif role_filter == "assistant" and msg.role != "assistant":
-                        continue
-                    elif role_filter == "tool" and msg.role != "tool":
-                        continue
-                    elif not include_tools and msg.role == "tool":
-                        continue
-
-                    # Store message metadata without content to keep responses small
-                    filtered_messages.append({
-                        'session_id': conversation_metadata.session_id,
-                        'project': self._decode_project_name(session_file.parent.name),
-                        'timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
-                        'role': msg.role,
-                        'content_preview': msg.content[:100] + "..." if len(msg.content) > 100 else msg.content,
-                        'content_length': len(msg.content),
-                        'has_tool_uses': bool(msg.tool_uses),
-                        'message_index': len(filtered_messages)  # For referencing later
-                    })
-
-                all_messages.extend(filtered_messages)
-
-            except Exception:
+        worker = partial(_analyze_session_file, role_filter=role_filter, include_tools=include_tools)
+        for analyzed in _iter_session_files(worker, sessions_to_analyze):
+            if analyzed is None:
                 continue
+            session_id, file_role_counts, file_length, records = analyzed
+            session_count += 1
+            if file_role_counts and len(sessions_with_messages) < 10:
+                sessions_with_messages.setdefault(session_id[:8] + "...", None)
+            role_counts.update(file_role_counts)
+            total_length += file_length
+            if len(kept) < _ANALYZE_LIMIT:
+                kept.extend(records[:_ANALYZE_LIMIT - len(kept)])
+
+        total_messages = role_counts.total()
 
         return {
             'sessions_analyzed': session_count,
-            'total_messages': len(all_messages),
-            'messages_returned': min(len(all_messages), 100),
-            'messages': all_messages[:100],  # Return metadata only, not full content
-            'truncated': len(all_messages) > 100,
+            'total_messages': total_messages,
+            'messages_returned': min(total_messages, _ANALYZE_LIMIT),
+            'messages': kept,  # Return metadata only, not full content
+            'truncated': total_messages > _ANALYZE_LIMIT,
             'summary': {
                 'messages_by_role': {
-                    'user': len([m for m in all_messages if m['role'] == 'user']),
-                    'assistant': len([m for m in all_messages if m['role'] == 'assistant']),
-                    'tool': len([m for m in all_messages if m['role'] == 'tool'])
+                    'user': role_counts['user'],
+                    'assistant': role_counts['assistant'],
+                    'tool': role_counts['tool']
                 },
-                'avg_content_length': sum(m['content_length'] for m in all_messages) / len(all_messages) if all_messages else 0,
-                'sessions_with_messages': list(set(m['session_id'][:8] + "..." for m in all_messages))[:10]  # Show first 10 sessions
+                'avg_content_length': total_length / total_messages if total_messages else 0,
+                'sessions_with_messages': list(sessions_with_messages)  # Show first 10 sessions
             },
             'filter_applied': {
                 'role_filter': role_filter,
@@ -190,22 +546,21 @@ class SessionSearcher:
 
     def get_message_details(self, session_id: str, message_indices: List[int]) -> Dict[str, Any]:
         """Get full content for specific messages by session and index"""
-        session_file = None
-        for project_dir in self.claude_dir.iterdir():
-            session_file_path = project_dir / f"{session_id}.jsonl"
-            if session_file_path.exists():
-                session_file = session_file_path
-                break
-
+        session_file = self._find_session_file(session_id)
         if not session_file:
             return {'error': f'Session {session_id} not found'}
 
         try:
-            conversation_metadata, messages = self.parser.parse_conversation_file(session_file)
+            if _is_parse_cached(session_file):
+                _, messages = _parse_session_file(session_file)
+                message_count = len(messages)
+            else:
+                # Build only the requested messages instead of the whole session
+                message_count, messages = _get_parser().parse_messages_at(session_file, message_indices)
 
             requested_messages = []
             for idx in message_indices:
-                if 0 <= idx < len(messages):
+                if 0 <= idx < message_count:
                     msg = messages[idx]
                     requested_messages.append({
                         'index': idx,
@@ -217,9 +572,12 @@ class SessionSearcher:
 
             return {
                 'session_id': session_id,
-                'total_messages_in_session': len(messages),
+                'total_messages_in_session': message_count,
                 'requested_messages': requested_messages
             }
+        except FileNotFoundError:
+            # Deleted since the session index was built
+            return {'error': f'Session {session_id} not found'}
         except Exception as e:
             return {'error': f'Failed to load session: {str(e)}'}
 
@@ -230,151 +588,561 @@ class SessionSearcher:
                            project_filter: Optional[str] = None,
                            case_sensitive: bool = False,
                            role_filter: str = "both",
-                           start_time: Optional[str] = None,
-                           end_time: Optional[str] = None) -> Dict[str, Any]:
-        """Search conversations with context windows, role filtering, and time ranges"""
+                           start_time: Optional[Union[str, datetime]] = None,
+                           end_time: Optional[Union[str, datetime]] = None,
+                           max_results: Optional[int] = 20,
+                           regex: bool = False) -> Dict[str, Any]:
+        """
+        Search conversations with context windows, role filtering, and time ranges.
 
-        # Parse time range if provided
-        start_datetime = None
-        end_datetime = None
-        if start_time:
-            try:
-                # Handle both naive and timezone-aware input
-                if start_time.endswith('Z'):
-                    start_datetime = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                elif '+' in start_time:
-                    start_datetime = datetime.fromisoformat(start_time)
-                else:
-                    # Naive datetime - assume local time and convert to UTC
-                    naive_dt = datetime.fromisoformat(start_time)
-                    # Get local timezone offset (assuming MST/PDT which is UTC-7)
-                    local_tz = datetime.now().astimezone().tzinfo
-                    local_dt = naive_dt.replace(tzinfo=local_tz)
-                    start_datetime = local_dt.astimezone(timezone.utc)
-            except ValueError:
-                return {'error': f'Invalid start_time format: {start_time}. Use ISO format like 2025-09-13T08:00:00'}
-
-        if end_time:
+        The query is a literal substring unless regex is set, in which case
+        it is a Python regular expression (and the index can't narrow the
+        files to read). Scanning stops once max_results matches have been
+        collected (the response is flagged 'truncated'); pass None to scan
+        every session. 'total_matches' counts the matches in the sessions
+        scanned before stopping, so more may exist when 'truncated' is set.
+        days_back is ignored when start_time is given.
+        """
+        if regex:
             try:
-                # Handle both naive and timezone-aware input
-                if end_time.endswith('Z'):
-                    end_datetime = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                elif '+' in end_time:
-                    end_datetime = datetime.fromisoformat(end_time)
-                else:
-                    # Naive datetime - assume local time and convert to UTC
-                    naive_dt = datetime.fromisoformat(end_time)
-                    # Get local timezone offset (assuming MST/PDT which is UTC-7)
-                    local_tz = datetime.now().astimezone().tzinfo
-                    local_dt = naive_dt.replace(tzinfo=local_tz)
-                    end_datetime = local_dt.astimezone(timezone.utc)
-            except ValueError:
-                return {'error': f'Invalid end_time format: {end_time}. Use ISO format like 2025-09-13T12:00:00'}
+                _get_matcher(query, case_sensitive, regex)
+            except re.error as e:
+                return {'error': f'Invalid regular expression: {e}'}
+
+        # Parse time range if provided
+        try:
+            start_datetime = _parse_time_bound(start_time) if start_time else None
+        except ValueError:
+            return {'error': f'Invalid start_time format: {start_time}. Use ISO format like 2025-09-13T08:00:00'}
+        try:
+            end_datetime = _parse_time_bound(end_time) if end_time else None
+        except ValueError:
+            return {'error': f'Invalid end_time format: {end_time}. Use ISO format like 2025-09-13T12:00:00'}
 
         # Get sessions to search (expand search if time range specified)
         search_days = days_back
         if start_datetime:
-            # Calculate how many days back we need to search
-            # Use a safe comparison - assume start_datetime is in local time if naive
-            now = datetime.now()
-            if start_datetime.tzinfo is None:
-                # Naive datetime - compare directly
-                days_diff = (now - start_datetime).days + 1
-            else:
-                # Timezone-aware - convert now to UTC for comparison
-                now_utc = now.replace(tzinfo=timezone.utc)
-                days_diff = (now_utc - start_datetime).days + 1
-            search_days = max(search_days, abs(days_diff) + 1)  # abs() in case start_time is in future
+            # An explicit start is authoritative: a session with messages after
+            # it was modified after it, so older sessions need not be read
+            search_days = max((datetime.now(timezone.utc) - start_datetime).days + 1, 1)
 
-        recent_sessions = self.get_recent_sessions(search_days, project_filter)
-        results = []
+        session_files = self._recent_paths(search_days, project_filter)
 
         # Validate role_filter
         if role_filter not in ["user", "assistant", "both", "tool"]:
             role_filter = "both"
 
-        flags = 0 if case_sensitive else re.IGNORECASE
-        pattern = re.compile(re.escape(query), flags)
-
-        for session_info in recent_sessions:
-            try:
-                session_file = Path(session_info['file_path'])
-                conversation_metadata, messages = self.parser.parse_conversation_file(session_file)
-
-                # Search through messages
-                for i, msg in enumerate(messages):
-                    # Filter by role
-                    if role_filter == "user" and msg.role != "user":
-                        continue
-                    elif role_filter == "assistant" and msg.role != "assistant":
-                        continue
-                    elif role_filter == "tool" and msg.role != "tool":
-                        continue
-
-                    # Filter by time range
-                    if msg.timestamp:
-                        msg_time = msg.timestamp
-
-                        # Timezone-aware comparison (both should be in UTC now)
-                        if start_datetime:
-                            # Convert message time to UTC if needed
-                            if msg_time.tzinfo is None:
-                                # Message time is naive, assume UTC
-                                msg_time_utc = msg_time.replace(tzinfo=timezone.utc)
-                            else:
-                                # Convert to UTC
-                                msg_time_utc = msg_time.astimezone(timezone.utc)
-
-                            if msg_time_utc < start_datetime:
-                                continue
-
-                        if end_datetime:
-                            # Convert message time to UTC if needed
-                            if msg_time.tzinfo is None:
-                                # Message time is naive, assume UTC
-                                msg_time_utc = msg_time.replace(tzinfo=timezone.utc)
-                            else:
-                                # Convert to UTC
-                                msg_time_utc = msg_time.astimezone(timezone.utc)
-
-                            if msg_time_utc > end_datetime:
-                                continue
-                    elif start_datetime or end_datetime:
-                        # Skip messages without timestamps if time filtering is requested
-                        continue
-
-                    # Search for query in message content
-                    if pattern.search(msg.content):
-                        # Get context window
-                        start_idx = max(0, i - context_window)
-                        end_idx = min(len(messages), i + context_window + 1)
-
-                        context_messages = []
-                        for j in range(start_idx, end_idx):
-                            context_msg = messages[j]
-                            context_messages.append({
-                                'role': context_msg.role,
-                                'content': context_msg.content[:500],  # Truncate long messages
-                                'timestamp': context_msg.timestamp.isoformat() if context_msg.timestamp else None,
-                                'is_match': (j == i),
-                                'content_length': len(context_msg.content)
-                            })
-
-                        results.append({
-                            'session_id': conversation_metadata.session_id,
-                            'project': self._decode_project_name(session_file.parent.name),
-                            'match_timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
-                            'match_content': msg.content,
-                            'match_content_length': len(msg.content),
-                            'context_window': context_messages
-                        })
+        worker = partial(_scan_session_file,
+                         query=query,
+                         case_sensitive=case_sensitive,
+                         role_filter=role_filter,
+                         start_datetime=start_datetime,
+                         end_datetime=end_datetime,
+                         context_window=context_window,
+                         limit=max_results,
+                         regex=regex)
+        candidates = None
+        if not regex:
+            candidates = self._index_candidates(session_files, query, role_filter, start_datetime, end_datetime)
+        if candidates is not None:
+            session_files = [f for f in session_files if str(f) in candidates]
 
-            except Exception:
-                continue
+        # Sessions arrive newest first, so stop parsing once the cap is reached
+        results = []
+        total_matches = 0
+        truncated = False
+        with closing(_iter_session_files(worker, session_files)) as file_results:
+            for match_count, session_results in file_results:
+                total_matches += match_count
+                results.extend(session_results)
+                if max_results is not None and len(results) >= max_results:
+                    truncated = True
+                    break
 
         return {
             'query': query,
-            'total_matches': len(results),
+            'total_matches': total_matches,
             'context_window_size': context_window,
-            'results': results[:20]  # Limit results to keep response manageable
-        }
\ No newline at end of file
+            'truncated': truncated,
+            'results': results[:max_results]  # Limit results to keep response manageable
+        }
+
+
+    def list_conversations_in_range(self,
+                                    start_time: Union[str, datetime],
+                                    end_time: Union[str, datetime],
+                                    project_filter: Optional[str] = None,
+                                    role_filter: str = "both") -> Dict[str, Any]:
+        """
+        List every message between start_time and end_time, oldest first.
+
+        Unlike search_conversations there is no query: this is a plain range
+        scan for callers (like the summarizer) that want all messages in a
+        window. Only sessions modified since start_time are read, and the
+        index narrows them to files with messages in the range. The bounds
+        may be ISO strings or datetimes and are inclusive.
+        """
+        try:
+            start_datetime = _parse_time_bound(start_time)
+        except ValueError:
+            return {'error': f'Invalid start_time format: {start_time}. Use ISO format like 2025-09-13T08:00:00'}
+        try:
+            end_datetime = _parse_time_bound(end_time)
+        except ValueError:
+            return {'error': f'Invalid end_time format: {end_time}. Use ISO format like 2025-09-13T12:00:00'}
+
+        if role_filter not in ["user", "assistant", "both", "tool"]:
+            role_filter = "both"
+
+        # A session with messages after start_time was modified after it
+        days_back = max((datetime.now(timezone.utc) - start_datetime).days + 1, 1)
+        session_files = self._recent_paths(days_back, project_filter)
+
+        roles = _ROLE_FILTERS.get(role_filter)
+        start_ts, end_ts = timestamp_key(start_datetime), timestamp_key(end_datetime)
+        if self.index.sync(session_files, lambda stale: _iter_session_files(_index_rows, stale)):
+            candidates = self.index.files_in_range(roles, start_ts, end_ts)
+            if candidates is not None:
+                session_files = [f for f in session_files if str(f) in candidates]
+
+        worker = partial(_range_session_file,
+                         role_filter=role_filter,
+                         start_datetime=start_datetime,
+                         end_datetime=end_datetime)
+        timed_messages = []
+        for session_messages in _iter_session_files(worker, session_files):
+            timed_messages.extend(session_messages)
+        timed_messages.sort(key=lambda timed: timed[0])
+        messages = [message for _, message in timed_messages]
+
+        return {
+            'start_time': start_time if isinstance(start_time, str) else start_time.isoformat(),
+            'end_time': end_time if isinstance(end_time, str) else end_time.isoformat(),
+            'total_messages': len(messages),
+            'messages': messages
+        }
+
+    def _index_candidates(self,
+                          session_files: List[Path],
+                          query: str,
+                          role_filter: str,
+                          start_datetime: Optional[datetime],
+                          end_datetime: Optional[datetime]) -> Optional[set]:
+        """Bring the index up to date for these files and return the ones that may match, or None to scan all"""
+        if len(fold_text(query)) < MIN_QUERY_LENGTH:
+            return None
+
+        if not self.index.sync(session_files, lambda stale: _iter_session_files(_index_rows, stale)):
+            return None
+
+        roles = _ROLE_FILTERS.get(role_filter)
+        return self.index.candidate_files(query, roles, timestamp_key(start_datetime), timestamp_key(end_datetime))
+
+
+def _session_sort_key(session_info: Dict[str, Any]) -> str:
+    """Sort key for newest-first session listings"""
+    return session_info['started_at'] or '1970-01-01'
+
+
+@lru_cache(maxsize=1)
+def default_searcher() -> SessionSearcher:
+    """Process-wide SessionSearcher, so its manifest, caches and index connection are shared"""
+    return SessionSearcher()
+
+
+def _scandir_jsonl(dir_path: str) -> Iterator[os.DirEntry]:
+    """
+    Yield the .jsonl files in a directory as DirEntry objects.
+
+    is_file() comes from the directory listing on Linux, and entry.stat()
+    is cached on the entry, so callers pay at most one stat per file.
+    """
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.endswith('.jsonl') and entry.is_file():
+                    yield entry
+    except OSError:
+        return
+
+
+def _parse_time_bound(value: Union[str, datetime]) -> datetime:
+    """
+    Parse a start_time/end_time argument into a timezone-aware UTC datetime.
+
+    Accepts an ISO string or a datetime. Values with an offset (or a trailing
+    'Z') keep it; naive values are taken as local time. Raises ValueError for
+    anything fromisoformat rejects.
+    """
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        # Naive datetime - assume local time
+        parsed = parsed.astimezone()
+    return parsed.astimezone(timezone.utc)
+
+
+def _in_time_range(timestamp: Optional[datetime],
+                   start_datetime: Optional[datetime],
+                   end_datetime: Optional[datetime]) -> bool:
+    """Whether a message time falls within the (timezone-aware UTC) bounds"""
+    if timestamp is None:
+        # Messages without timestamps never match a time filter
+        return False
+    if timestamp.tzinfo is None:
+        # Message time is naive, assume UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    if start_datetime and timestamp < start_datetime:
+        return False
+    if end_datetime and timestamp > end_datetime:
+        return False
+    return True
+
+
+def _iter_session_files(worker: Callable[[Path], Any], session_files: List[Path]) -> Iterator[Any]:
+    """
+    Apply worker to every session file, yielding results in input order.
+
+    Files are independent, so they are parsed in the shared process pool
+    (see _get_pool). Files this process already has in its parse cache (and
+    a lone uncached file) run inline to avoid the pickling overhead. Workers
+    report the keys of the sessions they loaded, whose sidecars are then
+    current, so a repeated call over the same range runs inline and fills
+    the parse cache from the sidecars as it goes.
+    Closing the generator early cancels the files that haven't started.
+    """
+    pooled = [not _is_parse_cached(session_file) for session_file in session_files]
+    pending = [session_file for session_file, in_pool in zip(session_files, pooled) if in_pool]
+    if len(pending) <= 1:
+        for session_file in session_files:
+            yield worker(session_file)
+        return
+
+    done = 0
+    try:
+        pool_results = _get_pool().map(partial(_pool_task, worker), pending, chunksize=4)
+        try:
+            for session_file, in_pool in zip(session_files, pooled):
+                if in_pool:
+                    result, loaded_keys = next(pool_results)
+                    _note_sidecars(loaded_keys)
+                else:
+                    result = worker(session_file)
+                done += 1
+                yield result
+        finally:
+            pool_results.close()
+    except (BrokenProcessPool, OSError):
+        # Worker processes can't start in some sandboxes; parse the rest inline
+        _discard_pool()
+        for session_file in session_files[done:]:
+            yield worker(session_file)
+
+
+def _pool_task(worker: Callable[[Path], Any], session_file: Path) -> Tuple[Any, List[Tuple[str, int, int]]]:
+    """
+    Run worker in a pool process; also return the keys of the sessions it
+    loaded. Only keys go back: the parsed sessions themselves would make
+    every result as large as the parse.
+    """
+    try:
+        return worker(session_file), list(_worker_loaded)
+    finally:
+        _worker_loaded.clear()
+
+
+def _note_sidecars(keys: List[Tuple[str, int, int]]) -> None:
+    with _parse_cache_lock:
+        for key in keys:
+            _sidecar_keys[key] = None
+            _sidecar_keys.move_to_end(key)
+        while len(_sidecar_keys) > _SIDECAR_KEYS_SIZE:
+            _sidecar_keys.popitem(last=False)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every call, created on first use.
+
+    Starting workers (and importing this module in each) costs tens of
+    milliseconds, more than parsing a typical batch of sessions, so the
+    workers are kept for the life of the server.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=_pool_context())
+        return _pool
+
+
+def _discard_pool() -> None:
+    """Drop a broken pool so the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_context():
+    """
+    Prefer forkserver: the MCP stdio transport runs reader threads, and
+    forking a multi-threaded process can deadlock.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context()
+
+
+@lru_cache(maxsize=1)
+def _get_parser() -> JSONLParser:
+    """Per-process parser instance for pool workers"""
+    return JSONLParser()
+
+
+@lru_cache(maxsize=1)
+def _get_session_cache() -> SessionCache:
+    """Per-process handle on the on-disk parse cache"""
+    return SessionCache()
+
+
+def _parse_key(session_file: Path) -> Tuple[str, int, int]:
+    # Size as well as mtime: an append within the mtime granularity still changes the key
+    stat = os.stat(session_file)
+    return str(session_file), stat.st_mtime_ns, stat.st_size
+
+
+def _is_parse_cached(session_file: Path) -> bool:
+    """Whether this process can load the session cheaply: from memory or a sidecar a worker just wrote"""
+    try:
+        key = _parse_key(session_file)
+    except OSError:
+        return False
+    return key in _parse_cache or key in _sidecar_keys
+
+
+def _parse_session_file(session_file: Path) -> Tuple[ConversationMetadata, List[ParsedMessage]]:
+    """
+    parse_conversation_file with an LRU cache keyed by (path, mtime_ns, size).
+
+    Only the server process caches in memory: it decides what goes to the
+    pool, and caching in every worker as well would just hold duplicate
+    memory. Workers instead report which sessions they loaded (see
+    _pool_task). Workers and server misses both go through the on-disk
+    sidecars (see core.session_cache). Callers must treat the
+    returned metadata and messages as read-only.
+    """
+    key = _parse_key(session_file)
+    if multiprocessing.parent_process() is not None:
+        parsed = _load_or_parse(session_file, key)
+        _worker_loaded.append(key)
+        return parsed
+
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(key)
+        if parsed is not None:
+            _parse_cache.move_to_end(key)
+            return parsed
+
+    parsed = _load_or_parse(session_file, key)
+    _cache_parsed(key, parsed)
+    return parsed
+
+
+def _cache_parsed(key: Tuple[str, int, int], parsed: Tuple[ConversationMetadata, List[ParsedMessage]]) -> None:
+    """Add a parsed session to the server's LRU parse cache"""
+    with _parse_cache_lock:
+        _parse_cache[key] = parsed
+        _parse_cache.move_to_end(key)
+        if len(_parse_cache) > _PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+
+
+def _load_or_parse(session_file: Path, key: Tuple[str, int, int]) -> Tuple[ConversationMetadata, List[ParsedMessage]]:
+    """Parsed session from its on-disk sidecar, parsing and writing the sidecar on a miss"""
+    session_cache = _get_session_cache()
+    parsed = session_cache.get(key)
+    if parsed is None:
+        parsed = _get_parser().parse_conversation_file(session_file)
+        session_cache.set(key, parsed)
+    return parsed
+
+
+@lru_cache(maxsize=8)
+def _get_matcher(query: str, case_sensitive: bool, regex: bool = False) -> Union[_LiteralMatcher, _RegexMatcher]:
+    """Compile the matcher once per process rather than once per file"""
+    if regex:
+        return _RegexMatcher(query, case_sensitive)
+    return _LiteralMatcher(query, case_sensitive)
+
+
+def _index_rows(session_file: Path) -> Optional[List[IndexRow]]:
+    """Build the search index rows for one session file; None if it can't be parsed"""
+    try:
+        _, messages = _parse_session_file(session_file)
+    except Exception:
+        return None
+    return [(i, msg.role, timestamp_key(msg.timestamp), fold_text(msg.content))
+            for i, msg in enumerate(messages)]
+
+
+def _analyze_session_file(session_file: Path, role_filter: str,
+                          include_tools: bool) -> Optional[Tuple[str, Counter, int, List[Dict[str, Any]]]]:
+    """
+    Filter one session's messages for analyze_sessions.
+
+    Returns (session_id, role_counts, total_content_length, records) where
+    the counts cover every kept message and records holds metadata dicts
+    for the first _ANALYZE_LIMIT of them; None if it can't be parsed.
+    """
+    try:
+        conversation_metadata, messages = _parse_session_file(session_file)
+        session_id = conversation_metadata.session_id
+        project = SessionSearcher._decode_project_name(session_file.parent.name)
+
+        # Drop filtered roles up front so the loop below does no role tests
+        allowed = _ROLE_FILTERS.get(role_filter)
+        if allowed is not None:
+            if not include_tools:
+                allowed = allowed - {'tool'}
+            kept = [msg for msg in messages if msg.role in allowed]
+        elif include_tools:
+            kept = messages
+        else:
+            kept = [msg for msg in messages if msg.role != 'tool']
+
+        role_counts = Counter()
+        total_length = 0
+        records = []
+        for msg in kept:
+            content = msg.content
+            content_length = len(content)
+            role_counts[msg.role] += 1
+            total_length += content_length
+            if len(records) >= _ANALYZE_LIMIT:
+                continue
+
+            # Store message metadata without content to keep responses small
+            records.append({
+                'session_id': session_id,
+                'project': project,
+                'timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
+                'role': msg.role,
+                'content_preview': content[:100] + "..." if content_length > 100 else content,
+                'content_length': content_length,
+                'has_tool_uses': bool(msg.tool_uses),
+                'message_index': len(records)  # For referencing later
+            })
+
+        return session_id, role_counts, total_length, records
+
+    except Exception:
+        return None
+
+
+def _range_session_file(session_file: Path,
+                        role_filter: str,
+                        start_datetime: datetime,
+                        end_datetime: datetime) -> List[Tuple[float, Dict[str, Any]]]:
+    """(epoch seconds, message dict) pairs of one session file for list_conversations_in_range"""
+    try:
+        conversation_metadata, messages = _parse_session_file(session_file)
+    except Exception:
+        return []
+
+    session_id = conversation_metadata.session_id
+    project = SessionSearcher._decode_project_name(session_file.parent.name)
+    allowed = _ROLE_FILTERS.get(role_filter)
+    in_range = []
+    for i, msg in enumerate(messages):
+        if allowed is not None and msg.role not in allowed:
+            continue
+        if not _in_time_range(msg.timestamp, start_datetime, end_datetime):
+            continue
+        in_range.append((timestamp_key(msg.timestamp), {
+            'session_id': session_id,
+            'project': project,
+            'message_index': i,
+            'role': msg.role,
+            'timestamp': msg.timestamp.isoformat(),
+            'content': msg.content
+        }))
+    return in_range
+
+
+def _scan_session_file(session_file: Path,
+                       query: str,
+                       case_sensitive: bool,
+                       role_filter: str,
+                       start_datetime: Optional[datetime],
+                       end_datetime: Optional[datetime],
+                       context_window: int,
+                       limit: Optional[int] = None,
+                       regex: bool = False) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Search one session file for search_conversations.
+
+    Returns the number of matches and the result dicts for the first limit
+    of them; matches past the limit can never survive the caller's cap, so
+    they are counted without building their context windows.
+    """
+    match_count = 0
+    results = []
+
+    try:
+        matcher = _get_matcher(query, case_sensitive, regex)
+        if (matcher.raw_needle is not None and not _is_parse_cached(session_file)
+                and not file_contains(session_file, matcher.raw_needle)):
+            # No match possible; skip parsing the file at all
+            return 0, []
+
+        conversation_metadata, messages = _parse_session_file(session_file)
+        allowed = _ROLE_FILTERS.get(role_filter)
+        session_id = conversation_metadata.session_id
+        project = SessionSearcher._decode_project_name(session_file.parent.name)
+
+        # Scan the messages of the wanted roles once, mapping hits back to
+        # session indices for the context windows
+        if allowed is None:
+            hits = matcher.matching_indices([m.content for m in messages])
+        else:
+            candidates = [i for i, m in enumerate(messages) if m.role in allowed]
+            hits = [candidates[k] for k in matcher.matching_indices([messages[i].content for i in candidates])]
+
+        for i in hits:
+            msg = messages[i]
+
+            # Filter by time range
+            if (start_datetime or end_datetime) and not _in_time_range(msg.timestamp, start_datetime, end_datetime):
+                continue
+
+            match_count += 1
+            if limit is not None and len(results) >= limit:
+                continue
+
+            # Get context window
+            start_idx = max(0, i - context_window)
+            end_idx = min(len(messages), i + context_window + 1)
+
+            context_messages = [{
+                'role': context_msg.role,
+                'content': context_msg.content[:500],  # Truncate long messages
+                'timestamp': context_msg.timestamp.isoformat() if context_msg.timestamp else None,
+                'is_match': (j == i),
+                'content_length': len(context_msg.content)
+            } for j, context_msg in enumerate(messages[start_idx:end_idx], start_idx)]
+
+            content = msg.content
+            results.append({
+                'session_id': session_id,
+                'project': project,
+                'match_timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
+                'match_content': content,
+                'match_content_length': len(content),
+                'match_positions': matcher.positions(content),
+                'context_window': context_messages
+            })
+
+    except Exception:
+        pass
+
+    return match_count, results
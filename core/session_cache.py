@@ -0,0 +1,175 @@
+"""
+On-disk cache of parsed session files.
+
+Loading the parser's output back is faster than re-parsing a session's
+JSONL, so the first searches after the server starts (when the in-memory
+parse cache is still empty) read JSON sidecars instead. The sidecars are
+plain data (message fields as arrays, datetimes as ISO strings) rather
+than pickles: anyone able to write to the cache directory must not be
+able to run code in the server. Each sidecar records the
+(path, mtime_ns, size) key of the file it was parsed from and is ignored
+once that file changes; the least recently used sidecars are deleted
+when the directory grows past its size limit.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.conversation_parser import ConversationMetadata, ParsedMessage
+from core.index import default_cache_dir
+from core.jsonl import dumps, loads
+
+# Total bytes of sidecars kept before the least recently used are deleted
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+# Sidecar writes between directory size checks
+_PRUNE_INTERVAL = 64
+
+# Bump when ParsedMessage, ConversationMetadata or the parser output changes
+_FORMAT_VERSION = 2
+
+ParseKey = Tuple[str, int, int]
+ParsedSession = Tuple[ConversationMetadata, List[ParsedMessage]]
+
+
+class SessionCache:
+    """Directory of JSON-encoded (metadata, messages) tuples, one per session file"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir() / 'parsed'
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._writes = 0
+
+    def _sidecar(self, path_str: str) -> Path:
+        digest = hashlib.blake2b(path_str.encode('utf-8', 'surrogatepass'), digest_size=16)
+        return self.cache_dir / f'{digest.hexdigest()}.json'
+
+    def get(self, key: ParseKey) -> Optional[ParsedSession]:
+        """Parsed session for key, or None if there is no up-to-date sidecar"""
+        sidecar = self._sidecar(key[0])
+        try:
+            with open(sidecar, 'rb') as f:
+                data = loads(f.read())
+            if data['version'] != _FORMAT_VERSION or tuple(data['key']) != key:
+                return None
+            parsed = _decode_session(data)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Truncated, tampered with or written by another version; set() replaces it
+            self.logger.debug(f"Ignoring unreadable sidecar {sidecar}: {e}")
+            return None
+
+        try:
+            # Reads count as use for pruning
+            os.utime(sidecar)
+        except OSError:
+            pass
+        return parsed
+
+    def set(self, key: ParseKey, parsed: ParsedSession) -> None:
+        """Write the sidecar for key atomically, pruning the directory now and then"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            text = dumps(_encode_session(key, parsed), pretty=False)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, self._sidecar(key[0]))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.warning(f"Session cache write failed: {e}")
+            return
+
+        self._writes += 1
+        if self._writes >= _PRUNE_INTERVAL:
+            self._writes = 0
+            self.prune()
+
+    def prune(self) -> None:
+        """Delete the least recently used sidecars until the directory fits max_bytes"""
+        sidecars = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.pickle'):
+                        # Sidecar format of older versions, never read now
+                        try:
+                            os.unlink(entry.path)
+                        except OSError:
+                            pass
+                        continue
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    sidecars.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        if total <= self.max_bytes:
+            return
+        sidecars.sort()
+        for _, size, path in sidecars:
+            try:
+                os.unlink(path)
+            except OSError:
+                # Another process may have pruned it already
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _fromisoformat(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _encode_session(key: ParseKey, parsed: ParsedSession) -> Dict[str, Any]:
+    """JSON-safe form of a parsed session; messages become field arrays to keep sidecars small"""
+    metadata, messages = parsed
+    return {
+        'version': _FORMAT_VERSION,
+        'key': list(key),
+        'metadata': [metadata.project_name, metadata.project_path, metadata.session_id,
+                     metadata.git_branch, _isoformat(metadata.started_at), _isoformat(metadata.ended_at),
+                     metadata.working_directory, metadata.message_count, metadata.file_path],
+        'messages': [[msg.uuid, msg.role, msg.content, _isoformat(msg.timestamp), msg.tool_uses, msg.metadata]
+                     for msg in messages]
+    }
+
+
+def _decode_session(data: Dict[str, Any]) -> ParsedSession:
+    """Inverse of _encode_session; raises on malformed data"""
+    (project_name, project_path, session_id, git_branch, started_at, ended_at,
+     working_directory, message_count, file_path) = data['metadata']
+    metadata = ConversationMetadata(
+        project_name=project_name,
+        project_path=project_path,
+        session_id=session_id,
+        git_branch=git_branch,
+        started_at=_fromisoformat(started_at),
+        ended_at=_fromisoformat(ended_at),
+        working_directory=working_directory,
+        message_count=message_count,
+        file_path=file_path
+    )
+    messages = [ParsedMessage(uuid, role, content, _fromisoformat(timestamp), tool_uses, msg_metadata)
+                for uuid, role, content, timestamp, tool_uses, msg_metadata in data['messages']]
+    return metadata, messages
@@ -1,45 +1,361 @@
 """
 Conversation summarization using headless Claude
 """
-import json
-import subprocess
-import tempfile
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-
+import asyncio
+import codecs
+import io
+import math
+import os
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
+
+try:
+    import anthropic
+except ImportError:  # optional: use the API directly instead of the claude CLI
+    anthropic = None
+
+try:
+    import tiktoken
+except ImportError:  # optional: budget prompt content in tokens instead of characters
+    tiktoken = None
+
+from core.jsonl import loads
 from core.models import ConversationSummary
-from core.searcher import SessionSearcher
+from core.searcher import SessionSearcher, default_searcher
+from core.summary_cache import SummaryCache, summary_key
 
+# Model used for headless summaries; part of the summary cache key
+CLAUDE_MODEL = 'claude-3-5-sonnet-latest'
+MAX_SUMMARY_TOKENS = 1500
 
-class ConversationSummarizer:
-    """Handles intelligent summarization of daily conversations"""
+# Concurrent Claude calls allowed by the batch entry point
+MAX_CONCURRENT_SUMMARIES = 8
+
+# Inclusive end of a day's range relative to its midnight
+_DAY_SPAN = timedelta(days=1, microseconds=-1)
+
+# Seconds between status checks of a Message Batches job
+BATCH_POLL_INTERVAL = 30.0
+
+# Seconds to wait for a Message Batches job before cancelling it and
+# summarizing its days one call at a time instead
+BATCH_TIMEOUT = 2 * 60 * 60.0
+
+# Bytes read per step when streaming CLI output to a callback
+STREAM_CHUNK_SIZE = 1024
+
+# Receives summary text incrementally as Claude produces it
+TextCallback = Callable[[str], None]
+
+# Characters of search results sent to Claude, to prevent timeouts
+MAX_SUMMARY_CONTENT = 6000
+
+# Characters of each message sent to Claude
+MESSAGE_PREVIEW_LENGTH = 500
+
+# Heading of the content sent to Claude for one day
+DAY_HEADING = "Daily Conversations Summary - {date}"
+
+# Per-message entries of that content; {content:.N} keeps only the preview
+_MESSAGE_ENTRY = (
+    "\n## Session: {session_id} ({project})\n"
+    f"**User Message:** {{content:.{MESSAGE_PREVIEW_LENGTH}}}...\n"
+)
+_TIMED_MESSAGE_ENTRY = (
+    "\n## Session: {session_id} ({project})\n"
+    "**Time:** {timestamp}\n"
+    f"**User Message:** {{content:.{MESSAGE_PREVIEW_LENGTH}}}...\n"
+)
+
+# Share of a message's 5-character shingles already seen in its session
+# above which it is dropped as a near-duplicate
+DUPLICATE_OVERLAP = 0.8
+
+# JSON in a ```json fence, otherwise the span from the first '{' to the last '}'
+_FENCED_JSON_RE = re.compile(r'```json(.*?)```', re.DOTALL)
+_BRACED_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Style-specific prompts; {date} is the day or range being summarized
+JOURNAL_PROMPT = """Analyze today's conversations ({date}) and create a concise daily recap suitable for a personal journal.
+
+Focus on:
+- Key accomplishments and activities discussed
+- Important decisions or insights
+- People mentioned and interactions
+- Projects worked on or discussed
+- Notable experiences or stories
+- Learning moments or realizations
+
+Format as a natural daily summary that captures the essence of the day's conversations."""
+
+INSIGHTS_PROMPT = """Analyze today's conversations ({date}) and extract key insights and learning moments.
 
-    def __init__(self):
-        self.searcher = SessionSearcher()
+Focus on:
+- Technical insights or breakthroughs
+- Problem-solving approaches
+- New understanding or realizations
+- Patterns in thinking or work
+- Lessons learned
+- Knowledge gaps identified
 
-    def summarize_daily_conversations(self, date: str, style: str = "journal",
-                                    project_filter: Optional[str] = None) -> Dict[str, Any]:
-        """Main entry point for daily conversation summarization"""
+Format as actionable insights for knowledge base enhancement."""
 
-        # Use the searcher to find conversations for the date
-        # Search for any content (broad query) within the specific date range
-        search_result = self.searcher.search_conversations(
-            query="the",  # Common word to catch most conversations
-            start_time=f"{date}T00:00:00",
-            end_time=f"{date}T23:59:59",
+STORIES_PROMPT = """Analyze today's conversations ({date}) and identify compelling stories or experiences worth capturing.
+
+Focus on:
+- Personal experiences and anecdotes
+- Interesting problem-solving journeys
+- Memorable interactions or conversations
+- Creative or innovative moments
+- Challenges overcome
+- Serendipitous discoveries
+
+Format as narrative summaries of the most story-worthy moments."""
+
+PROMPT_TEMPLATES = {
+    "journal": JOURNAL_PROMPT,
+    "insights": INSIGHTS_PROMPT,
+    "stories": STORIES_PROMPT
+}
+
+# Wraps a style prompt with the response format and the conversation content
+CLAUDE_ENVELOPE = """{prompt}
+
+Please analyze the conversation content and provide a structured summary.
+
+Return your response in this JSON format:
+{{
+    "summary": "Main summary text here",
+    "key_topics": ["topic1", "topic2", "topic3"],
+    "insights": ["insight1", "insight2"],
+    "stories": ["story1", "story2"],
+    "projects_mentioned": ["project1", "project2"],
+    "people_mentioned": ["person1", "person2"]
+}}
+
+Conversation content to analyze:
+{content}...
+"""
+
+# Characters of conversation content included in the prompt
+PROMPT_CONTENT_LENGTH = 5000
+
+# With tiktoken installed, tokens of the whole prompt (envelope plus content);
+# this replaces MAX_SUMMARY_CONTENT and PROMPT_CONTENT_LENGTH
+PROMPT_TOKEN_BUDGET = 1600
+
+# Rough characters per token of English text, for sizing message previews in tokens
+CHARS_PER_TOKEN = 4
+
+_TRUNCATION_NOTICE = "\n\n[Content truncated to prevent timeout]"
+
+
+class ConversationSummarizer:
+    """Handles intelligent summarization of daily conversations"""
+
+    __slots__ = ('searcher', 'cache', '_client')
+
+    def __init__(self, searcher: Optional[SessionSearcher] = None):
+        self.searcher = searcher or default_searcher()
+        self.cache = SummaryCache()
+
+        # A persistent API client reuses its connection pool across calls; without
+        # the SDK or an API key, fall back to spawning the claude CLI per summary
+        self._client = None
+        if anthropic is not None and os.environ.get('ANTHROPIC_API_KEY'):
+            self._client = anthropic.AsyncAnthropic()
+
+    async def summarize_daily_conversations(self, date: str, style: str = "journal",
+                                    project_filter: Optional[str] = None,
+                                    on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """
+        Main entry point for daily conversation summarization.
+
+        If on_text is given it is called with each chunk of summary text as
+        Claude produces it, before the full response is returned.
+        """
+        search_result = await asyncio.to_thread(self._search_day, date, project_filter)
+        return await self._summarize_day(date, style, search_result, on_text)
+
+    async def summarize_daily_conversations_batch(self, dates: List[str], styles: Optional[List[str]] = None,
+                                                  project_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Summarize every (date, style) pair, running the Claude calls concurrently.
+
+        Each date is searched once and shared by all of its styles. At most
+        MAX_CONCURRENT_SUMMARIES Claude calls are in flight at a time; results
+        come back in (date, style) order.
+        """
+        styles = styles or ["journal"]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SUMMARIES)
+
+        async def summarize(date: str, style: str, search_result: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._summarize_day(date, style, search_result)
+
+        # The group cancels and awaits every started summary if anything raises
+        async with asyncio.TaskGroup() as group:
+            tasks = []
+            for date in dates:
+                search_result = await asyncio.to_thread(self._search_day, date, project_filter)
+                tasks.extend(group.create_task(summarize(date, style, search_result)) for style in styles)
+        return [task.result() for task in tasks]
+
+    def _search_day(self, date: str, project_filter: Optional[str]) -> Dict[str, Any]:
+        """Find the user messages written on a date, up to the last microsecond before midnight"""
+        try:
+            start = datetime.fromisoformat(date)
+        except ValueError:
+            return {'error': f'Invalid date format: {date}. Use YYYY-MM-DD'}
+        return self._search_range(start, start + _DAY_SPAN, project_filter)
+
+    def _search_range(self, start_time: Union[str, datetime], end_time: Union[str, datetime],
+                      project_filter: Optional[str]) -> Dict[str, Any]:
+        """Find the user messages written in a time range"""
+        return self.searcher.list_conversations_in_range(
+            start_time=start_time,
+            end_time=end_time,
             project_filter=project_filter,
-            role_filter="user",  # Focus on user messages for summary
-            days_back=30,  # Look back far enough to catch the specific date
-            context_window=1
+            role_filter="user"  # Focus on user messages for summary
         )
 
-        if search_result.get('total_matches', 0) == 0:
+    async def summarize_date_range_batched(self, start_date: str, end_date: str, style: str = "journal",
+                                           project_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Backfill one summary per day from start_date to end_date (inclusive, YYYY-MM-DD).
+
+        With the Anthropic API client, all uncached days are submitted as a
+        single Message Batches job, which is cheaper than per-day calls but can
+        take minutes to hours to finish, so it is meant for bulk backfills
+        rather than interactive use. Without the client, or once the job has
+        run for BATCH_TIMEOUT seconds, this falls back to
+        summarize_daily_conversations_batch.
+        """
+        try:
+            first = datetime.strptime(start_date, '%Y-%m-%d')
+            last = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return [{'error': f'Invalid date range: {start_date} to {end_date}. Use YYYY-MM-DD'}]
+        dates = [(first + timedelta(days=n)).strftime('%Y-%m-%d') for n in range((last - first).days + 1)]
+
+        if self._client is None:
+            return await self.summarize_daily_conversations_batch(dates, [style], project_filter)
+
+        search_results = {date: await asyncio.to_thread(self._search_day, date, project_filter) for date in dates}
+        summary_results: Dict[str, Dict[str, Any]] = {}
+        session_counts: Dict[str, int] = {}
+        cache_keys = {}
+        requests = []
+        for date, search_result in search_results.items():
+            if search_result.get('total_messages', 0) == 0:
+                continue
+            conversation_content, session_counts[date] = self._prepare_range_content(
+                search_result, DAY_HEADING.format(date=date))
+            key = summary_key(CLAUDE_MODEL, style, date, conversation_content)
+            cached = self.cache.get(key)
+            if cached is not None:
+                summary_results[date] = cached
+                continue
+            cache_keys[date] = key
+            requests.append({
+                'custom_id': date,
+                'params': self._message_params(self._build_prompt(conversation_content, style, date))
+            })
+
+        fallback_responses: Dict[str, Dict[str, Any]] = {}
+        if requests:
+            try:
+                batch_results = await self._run_message_batch(requests)
+            except TimeoutError:
+                # The job has been cancelled; summarize its days with per-day calls
+                pending = list(cache_keys)
+                responses = await self.summarize_daily_conversations_batch(pending, [style], project_filter)
+                fallback_responses = dict(zip(pending, responses))
+                batch_results = {}
+            except Exception as e:
+                batch_results = {date: {'error': f'Message batch failed: {str(e)}'} for date in cache_keys}
+            for date, key in cache_keys.items():
+                if date in fallback_responses:
+                    continue
+                result = batch_results.get(date, {'error': 'Missing from message batch results'})
+                if not result.get('error'):
+                    self.cache.set(key, result)
+                summary_results[date] = result
+
+        return [fallback_responses.get(date) or
+                self._range_response({'date': date}, style, search_results[date], summary_results.get(date),
+                                     session_counts.get(date, 0))
+                for date in dates]
+
+    async def _run_message_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Submit a Message Batches job, wait for it to end and map custom_id -> summary result.
+
+        Raises TimeoutError, after cancelling the job, if it hasn't ended
+        within BATCH_TIMEOUT seconds.
+        """
+        batch = await self._client.messages.batches.create(requests=requests)
+        try:
+            async with asyncio.timeout(BATCH_TIMEOUT):
+                while batch.processing_status != 'ended':
+                    await asyncio.sleep(BATCH_POLL_INTERVAL)
+                    batch = await self._client.messages.batches.retrieve(batch.id)
+        except TimeoutError:
+            try:
+                await self._client.messages.batches.cancel(batch.id)
+            except Exception:
+                # The job expires on its own; its results are never read
+                pass
+            raise
+
+        results = {}
+        async for entry in await self._client.messages.batches.results(batch.id):
+            if entry.result.type == 'succeeded':
+                text = ''.join(block.text for block in entry.result.message.content if block.type == 'text')
+                results[entry.custom_id] = {'summary': text.strip()}
+            else:
+                results[entry.custom_id] = {'error': f'Message batch request {entry.result.type}'}
+        return results
+
+    async def _summarize_day(self, date: str, style: str, search_result: Dict[str, Any],
+                             on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """Summarize one date's search result in the given style"""
+        return await self._summarize_range({'date': date}, style, search_result,
+                                           DAY_HEADING.format(date=date), date, on_text=on_text)
+
+    async def _summarize_range(self, scope: Dict[str, str], style: str, search_result: Dict[str, Any],
+                               heading: str, label: str, include_timestamp: bool = False,
+                               on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """
+        Shared body of the daily and time-range summaries.
+
+        scope holds the leading response fields ('date', or 'start_time' and
+        'end_time'); heading titles the content sent to Claude and label is
+        the date or range named in the prompt.
+        """
+        if search_result.get('total_messages', 0) == 0:
+            return self._range_response(scope, style, search_result, None)
+
+        # Prepare content for Claude analysis
+        conversation_content, session_count = self._prepare_range_content(search_result, heading, include_timestamp)
+
+        # Generate summary using headless Claude
+        summary_result = await self._call_headless_claude_summary(conversation_content, style, label, on_text)
+        return self._range_response(scope, style, search_result, summary_result, session_count)
+
+    def _range_response(self, scope: Dict[str, str], style: str, search_result: Dict[str, Any],
+                        summary_result: Optional[Dict[str, Any]], session_count: int = 0) -> Dict[str, Any]:
+        """Summary response; summary_result is None when the range had no conversations"""
+        if summary_result is None:
             return {
-                'date': date,
+                **scope,
                 'total_sessions': 0,
                 'total_messages': 0,
                 'summary_style': style,
-                'summary': 'No conversations found for this date.',
+                'summary': f"No conversations found for this {'date' if 'date' in scope else 'time range'}.",
                 'key_topics': [],
                 'insights': [],
                 'stories': [],
@@ -47,19 +363,10 @@ class ConversationSummarizer:
                 'people_mentioned': []
             }
 
-        # Prepare content for Claude analysis
-        conversation_content = self._prepare_summary_content(search_result, date)
-
-        # Generate summary using headless Claude
-        summary_result = self._call_headless_claude_summary(conversation_content, style, date)
-
-        # Calculate session count
-        unique_sessions = len(set(r['session_id'] for r in search_result['results']))
-
         return {
-            'date': date,
-            'total_sessions': unique_sessions,
-            'total_messages': search_result['total_matches'],
+            **scope,
+            'total_sessions': session_count,
+            'total_messages': search_result['total_messages'],
             'summary_style': style,
             'summary': summary_result.get('summary', 'Summary generation failed'),
             'key_topics': summary_result.get('key_topics', []),
@@ -70,32 +377,29 @@ class ConversationSummarizer:
             'error': summary_result.get('error')
         }
 
-    def _prepare_summary_content(self, search_result: Dict[str, Any], date: str) -> str:
-        """Prepare conversation content for Claude analysis"""
-        content_parts = []
-        content_parts.append(f"# Daily Conversations Summary - {date}")
-        content_parts.append(f"Total messages: {search_result['total_matches']}")
-        content_parts.append("")
-
-        for result in search_result['results']:
-            content_parts.append(f"## Session: {result['session_id']} ({result['project']})")
-
-            # Include the actual message content (not just context window)
-            content_parts.append(f"**User Message:** {result['match_content'][:500]}...")
-            content_parts.append("")
-
-        # Limit total content to prevent timeout
-        full_content = "\n".join(content_parts)
-        if len(full_content) > 6000:
-            full_content = full_content[:6000] + "\n\n[Content truncated to prevent timeout]"
-
-        return full_content
-
-    def _call_headless_claude_summary(self, conversation_content: str, style: str, date: str) -> Dict[str, Any]:
-        """Call headless Claude to generate summary"""
-        return self._call_headless_claude(conversation_content, style, date)
-
-    def summarize_conversations(self, conversations_data: Dict[str, Any], style: str = "journal") -> ConversationSummary:
+    def _prepare_range_content(self, search_result: Dict[str, Any], heading: str,
+                               include_timestamp: bool = False) -> Tuple[str, int]:
+        """Prepare conversation content for Claude analysis; also returns the number of sessions"""
+        buf = io.StringIO()
+        buf.write(f"# {heading}\n")
+        buf.write(f"Total messages: {search_result['total_messages']}\n")
+
+        # Include the actual message content (not just context window)
+        entry = _TIMED_MESSAGE_ENTRY if include_timestamp else _MESSAGE_ENTRY
+        measure, budget = _content_budget()
+        size = measure(buf.getvalue())
+        sampled, session_count = _sample_by_session(search_result['messages'])
+        for result in sampled:
+            # Stop once past the budget; the rest would be truncated away
+            if size > budget:
+                break
+            piece = entry.format_map(result)
+            buf.write(piece)
+            size += measure(piece)
+
+        return _truncate_content(buf.getvalue()), session_count
+
+    async def summarize_conversations(self, conversations_data: Dict[str, Any], style: str = "journal") -> ConversationSummary:
         """Generate intelligent summary using headless Claude"""
 
         if 'error' in conversations_data:
@@ -117,7 +421,7 @@ class ConversationSummarizer:
         conversation_content = self._prepare_conversation_content(conversations_data, style)
 
         # Generate summary using headless Claude
-        summary_result = self._call_headless_claude(conversation_content, style, conversations_data['date'])
+        summary_result = await self._call_headless_claude(conversation_content, style, conversations_data['date'])
 
         if summary_result.get('error'):
             return ConversationSummary(
@@ -150,106 +454,120 @@ class ConversationSummarizer:
         content_parts.append(f"Total Messages: {conversations_data['total_messages']}")
         content_parts.append("")
 
-        for conv in conversations_data['conversations']:
+        # Give every session a fair share of the budget
+        conversations = conversations_data['conversations']
+        per_session = _per_session_cap(len(conversations))
+
+        for conv in conversations:
             content_parts.append(f"## Session: {conv['session_id']} ({conv['project']})")
 
-            for msg in conv['messages']:
+            messages = conv['messages']
+            for i in _select_distinct([msg.content for msg in messages], per_session):
+                msg = messages[i]
                 timestamp = msg.timestamp.strftime('%H:%M') if msg.timestamp else 'unknown'
-                content_parts.append(f"**{timestamp} - {msg.role}:** {msg.content[:500]}...")
+                content_parts.append(f"**{timestamp} - {msg.role}:** {msg.content[:MESSAGE_PREVIEW_LENGTH]}...")
 
             content_parts.append("")
 
         return "\n".join(content_parts)
 
-    def _call_headless_claude(self, conversation_content: str, style: str, date: str) -> Dict[str, Any]:
-        """Call headless Claude to generate summary"""
-
-        # Style-specific prompts
-        prompts = {
-            "journal": f"""Analyze today's conversations ({date}) and create a concise daily recap suitable for a personal journal.
-
-Focus on:
-- Key accomplishments and activities discussed
-- Important decisions or insights
-- People mentioned and interactions
-- Projects worked on or discussed
-- Notable experiences or stories
-- Learning moments or realizations
-
-Format as a natural daily summary that captures the essence of the day's conversations.""",
-
-            "insights": f"""Analyze today's conversations ({date}) and extract key insights and learning moments.
-
-Focus on:
-- Technical insights or breakthroughs
-- Problem-solving approaches
-- New understanding or realizations
-- Patterns in thinking or work
-- Lessons learned
-- Knowledge gaps identified
-
-Format as actionable insights for knowledge base enhancement.""",
-
-            "stories": f"""Analyze today's conversations ({date}) and identify compelling stories or experiences worth capturing.
-
-Focus on:
-- Personal experiences and anecdotes
-- Interesting problem-solving journeys
-- Memorable interactions or conversations
-- Creative or innovative moments
-- Challenges overcome
-- Serendipitous discoveries
+    async def _call_headless_claude(self, conversation_content: str, style: str, date: str,
+                                    on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """Call headless Claude to generate summary, reusing a cached result for identical input"""
+        key = summary_key(CLAUDE_MODEL, style, date, conversation_content)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if on_text is not None and cached.get('summary'):
+                on_text(cached['summary'])
+            return cached
+
+        result = await self._run_headless_claude(conversation_content, style, date, on_text)
+        if not result.get('error'):
+            self.cache.set(key, result)
+        return result
+
+    # Kept for the daily and time-range callers; an alias avoids a forwarding frame
+    _call_headless_claude_summary = _call_headless_claude
+
+    def _build_prompt(self, conversation_content: str, style: str, date: str) -> str:
+        """Full headless Claude prompt for one summary"""
+        prompt = PROMPT_TEMPLATES.get(style, JOURNAL_PROMPT).format(date=date)
+        if _token_encoding() is None:
+            content = conversation_content[:PROMPT_CONTENT_LENGTH]
+        else:
+            content, _ = _clip_tokens(conversation_content, _content_token_budget())
+        return CLAUDE_ENVELOPE.format(prompt=prompt, content=content)
+
+    async def _run_headless_claude(self, conversation_content: str, style: str, date: str,
+                                   on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """Generate one summary through the API client or the headless Claude CLI"""
+        claude_prompt = self._build_prompt(conversation_content, style, date)
+
+        # The prompt carries the content inline, so nothing is written to disk
+        try:
+            if self._client is not None:
+                return await self._call_api(claude_prompt, on_text)
+            return await self._call_cli(claude_prompt, on_text)
+        except Exception as e:
+            return {'error': f'Error calling headless Claude: {str(e)}'}
 
-Format as narrative summaries of the most story-worthy moments."""
+    def _message_params(self, claude_prompt: str) -> Dict[str, Any]:
+        """Messages API parameters for one summary prompt"""
+        return {
+            'model': CLAUDE_MODEL,
+            'max_tokens': MAX_SUMMARY_TOKENS,
+            'messages': [{'role': 'user', 'content': claude_prompt}]
         }
 
-        prompt = prompts.get(style, prompts["journal"])
-
-        # Create temporary file with conversation content
+    async def _call_api(self, claude_prompt: str, on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """Generate a summary with the Anthropic API client, streaming text to on_text"""
+        if on_text is None:
+            response = await self._client.messages.create(**self._message_params(claude_prompt))
+        else:
+            async with self._client.messages.stream(**self._message_params(claude_prompt)) as stream:
+                async for text in stream.text_stream:
+                    on_text(text)
+                response = await stream.get_final_message()
+        text = ''.join(block.text for block in response.content if block.type == 'text')
+        return {'summary': text.strip()}
+
+    async def _call_cli(self, claude_prompt: str, on_text: Optional[TextCallback] = None) -> Dict[str, Any]:
+        """Generate a summary with the headless claude CLI without blocking the event loop"""
+        process = await asyncio.create_subprocess_exec(
+            'claude', '--print', '--output-format', 'text',
+            '--model', CLAUDE_MODEL,
+            claude_prompt,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = None
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as temp_file:
-                temp_file.write(conversation_content)
-                temp_file_path = temp_file.name
-
-            # Call headless Claude
-            claude_prompt = f"""{prompt}
-
-Please analyze the conversation content and provide a structured summary.
-
-Return your response in this JSON format:
-{{
-    "summary": "Main summary text here",
-    "key_topics": ["topic1", "topic2", "topic3"],
-    "insights": ["insight1", "insight2"],
-    "stories": ["story1", "story2"],
-    "projects_mentioned": ["project1", "project2"],
-    "people_mentioned": ["person1", "person2"]
-}}
-
-Conversation content to analyze:
-{conversation_content[:5000]}...
-"""
-
-            result = subprocess.run([
-                'claude', '--print', '--output-format', 'text',
-                '--model', 'claude-3-5-sonnet-latest',
-                claude_prompt
-            ],
-            capture_output=True,
-            text=True
-            )
-
-            # Clean up temp file
-            import os
-            os.unlink(temp_file_path)
-
-            if result.returncode == 0:
-                return {'summary': result.stdout.strip()}
+            if on_text is None:
+                stdout, stderr = await process.communicate()
+                output = stdout.decode('utf-8', 'replace')
             else:
-                return {'error': f'Claude headless failed: {result.stderr}'}
-
-        except Exception as e:
-            return {'error': f'Error calling headless Claude: {str(e)}'}
+                # Drain stderr alongside so a chatty CLI can't block on a full pipe
+                stderr_task = asyncio.ensure_future(process.stderr.read())
+                output = await _read_stream(process.stdout, on_text)
+                stderr = await stderr_task
+                await process.wait()
+        except BaseException:
+            # Cancelled (client gone, timeout) or on_text raised: don't leave
+            # the CLI running with nobody reading its output
+            if stderr_task is not None:
+                stderr_task.cancel()
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            raise
+
+        if process.returncode == 0:
+            return {'summary': output.strip()}
+        else:
+            return {'error': f'Claude headless failed: {stderr.decode("utf-8", "replace")}'}
 
     def _parse_summary_response(self, claude_response: str, conversations_data: Dict[str, Any], style: str) -> ConversationSummary:
         """Parse Claude's response into structured summary"""
@@ -287,94 +605,164 @@ Conversation content to analyze:
 
     def _extract_json_from_response(self, response: str) -> Optional[Dict[str, Any]]:
         """Extract JSON data from Claude's response"""
+        # Look for JSON block in response
+        match = _FENCED_JSON_RE.search(response) or _BRACED_JSON_RE.search(response)
+        if match is None:
+            return None
         try:
-            # Look for JSON block in response
-            if '```json' in response:
-                start = response.find('```json') + 7
-                end = response.find('```', start)
-                json_str = response[start:end].strip()
-            elif '{' in response and '}' in response:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                json_str = response[start:end]
-            else:
-                return None
-
-            return json.loads(json_str)
-        except (json.JSONDecodeError, ValueError):
+            return loads(match.group(match.lastindex or 0).strip())
+        except ValueError:
             return None
 
-    def summarize_time_range(self, start_time: str, end_time: str,
+    async def summarize_time_range(self, start_time: str, end_time: str,
                            style: str = "journal", project_filter: Optional[str] = None) -> Dict[str, Any]:
-        """Summarize conversations within a specific time range using search functionality"""
-
-        # Use the searcher to find conversations in the time range
-        search_result = self.searcher.search_conversations(
-            query="the",  # Common word to catch most conversations
-            start_time=start_time,
-            end_time=end_time,
-            project_filter=project_filter,
-            role_filter="user",  # Focus on user messages for summary
-            days_back=30,  # Look back far enough to catch the time range
-            context_window=1
-        )
-
-        if search_result.get('total_matches', 0) == 0:
-            return {
-                'start_time': start_time,
-                'end_time': end_time,
-                'total_sessions': 0,
-                'total_messages': 0,
-                'summary_style': style,
-                'summary': 'No conversations found for this time range.',
-                'key_topics': [],
-                'insights': [],
-                'stories': [],
-                'projects_mentioned': [],
-                'people_mentioned': []
-            }
-
-        # Prepare content for Claude analysis
-        conversation_content = self._prepare_time_range_content(search_result, start_time, end_time)
-
-        # Generate summary using headless Claude
-        summary_result = self._call_headless_claude_summary(conversation_content, style, f"{start_time} to {end_time}")
-
-        # Calculate session count
-        unique_sessions = len(set(r['session_id'] for r in search_result['results']))
-
-        return {
-            'start_time': start_time,
-            'end_time': end_time,
-            'total_sessions': unique_sessions,
-            'total_messages': search_result['total_matches'],
-            'summary_style': style,
-            'summary': summary_result.get('summary', 'Summary generation failed'),
-            'key_topics': summary_result.get('key_topics', []),
-            'insights': summary_result.get('insights', []),
-            'stories': summary_result.get('stories', []),
-            'projects_mentioned': summary_result.get('projects_mentioned', []),
-            'people_mentioned': summary_result.get('people_mentioned', []),
-            'error': summary_result.get('error')
-        }
-
-    def _prepare_time_range_content(self, search_result: Dict[str, Any], start_time: str, end_time: str) -> str:
-        """Prepare time range conversation content for Claude analysis"""
-        content_parts = []
-        content_parts.append(f"# Time Range Conversations Summary - {start_time} to {end_time}")
-        content_parts.append(f"Total messages: {search_result['total_matches']}")
-        content_parts.append("")
-
-        for result in search_result['results']:
-            content_parts.append(f"## Session: {result['session_id']} ({result['project']})")
-            content_parts.append(f"**Time:** {result['match_timestamp']}")
-            content_parts.append(f"**User Message:** {result['match_content'][:500]}...")
-            content_parts.append("")
-
-        # Limit total content to prevent timeout
-        full_content = "\n".join(content_parts)
-        if len(full_content) > 6000:
-            full_content = full_content[:6000] + "\n\n[Content truncated to prevent timeout]"
-
-        return full_content
-
+        """Summarize conversations within a specific time range"""
+        search_result = await asyncio.to_thread(self._search_range, start_time, end_time, project_filter)
+        label = f"{start_time} to {end_time}"
+        return await self._summarize_range({'start_time': start_time, 'end_time': end_time}, style, search_result,
+                                           f"Time Range Conversations Summary - {label}", label,
+                                           include_timestamp=True)
+
+
+async def _read_stream(reader: asyncio.StreamReader, on_text: TextCallback) -> str:
+    """Read a subprocess pipe to EOF, passing each decoded chunk to on_text"""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    parts = []
+    while True:
+        chunk = await reader.read(STREAM_CHUNK_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            on_text(text)
+            parts.append(text)
+        if not chunk:
+            return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def _token_encoding():
+    """tiktoken encoding for content budgets, or None to budget in characters"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # The encoding is downloaded on first use, which can fail offline
+        return None
+
+
+@lru_cache(maxsize=None)
+def _content_token_budget() -> int:
+    """Tokens left for content after the longest prompt envelope"""
+    label = 'YYYY-MM-DDTHH:MM:SS to YYYY-MM-DDTHH:MM:SS'
+    overhead = max(_count_tokens(CLAUDE_ENVELOPE.format(prompt=template.format(date=label), content=''))
+                   for template in PROMPT_TEMPLATES.values())
+    return PROMPT_TOKEN_BUDGET - overhead
+
+
+def _count_tokens(text: str) -> int:
+    """Token count of text; conversation text may contain special-token markers, so none are disallowed"""
+    return len(_token_encoding().encode(text, disallowed_special=()))
+
+
+def _clip_tokens(text: str, budget: int) -> Tuple[str, bool]:
+    """Text cut to at most budget tokens, and whether anything was cut"""
+    encoding = _token_encoding()
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text, False
+    return encoding.decode(tokens[:budget]), True
+
+
+def _content_budget() -> Tuple[Callable[[str], int], int]:
+    """(size function, budget) for content: tokens with tiktoken, characters without"""
+    if _token_encoding() is None:
+        return len, MAX_SUMMARY_CONTENT
+    return _count_tokens, _content_token_budget()
+
+
+def _truncate_content(content: str) -> str:
+    """Limit total content to prevent timeout"""
+    if _token_encoding() is not None:
+        budget = _content_token_budget()
+        content, clipped = _clip_tokens(content, budget)
+        if not clipped:
+            return content
+        # Keep the notice inside the budget, or _build_prompt's clip drops it;
+        # tokens can merge differently across the join, so check the result
+        room = budget - _count_tokens(_TRUNCATION_NOTICE)
+        while True:
+            content, _ = _clip_tokens(content, room)
+            truncated = content + _TRUNCATION_NOTICE
+            if _count_tokens(truncated) <= budget:
+                return truncated
+            room -= 1
+    if len(content) > MAX_SUMMARY_CONTENT:
+        content = content[:MAX_SUMMARY_CONTENT] + _TRUNCATION_NOTICE
+    return content
+
+
+def _per_session_cap(session_count: int) -> int:
+    """Messages each session may contribute so no session crowds out the rest"""
+    measure, budget = _content_budget()
+    preview_size = MESSAGE_PREVIEW_LENGTH if measure is len else MESSAGE_PREVIEW_LENGTH / CHARS_PER_TOKEN
+    return max(1, math.ceil(budget / max(session_count, 1) / preview_size))
+
+
+def _shingles(text: str) -> set:
+    """5-character shingles of the part of a message that is sent to Claude"""
+    text = text[:MESSAGE_PREVIEW_LENGTH].lower()
+    if len(text) <= 5:
+        return {text}
+    return {text[i:i + 5] for i in range(len(text) - 4)}
+
+
+def _select_distinct(contents: List[str], cap: int) -> List[int]:
+    """
+    Indices (in order) of up to cap messages from one session, skipping
+    messages whose shingles mostly repeat earlier kept messages.
+    """
+    kept = []
+    seen = set()
+    for i, content in enumerate(contents):
+        if len(kept) >= cap:
+            break
+        shingles = _shingles(content)
+        if seen and len(shingles & seen) > DUPLICATE_OVERLAP * len(shingles):
+            continue
+        kept.append(i)
+        seen |= shingles
+    return kept
+
+
+def _sample_by_session(messages: List[Dict[str, Any]]) -> Tuple[Iterator[Dict[str, Any]], int]:
+    """
+    Apply _select_distinct per session to a flat message list, keeping its
+    order; also returns the number of distinct sessions.
+
+    The sample is produced lazily: a message's fate only depends on earlier
+    messages of its own session, so callers that stop at the content budget
+    never shingle the messages they would have thrown away.
+    """
+    session_counts = Counter(message['session_id'] for message in messages)
+    return _iter_distinct(messages, _per_session_cap(len(session_counts))), len(session_counts)
+
+
+def _iter_distinct(messages: List[Dict[str, Any]], cap: int) -> Iterator[Dict[str, Any]]:
+    """Streaming form of _select_distinct over interleaved sessions"""
+    kept: Dict[str, int] = {}
+    seen: Dict[str, set] = {}
+    for message in messages:
+        session_id = message['session_id']
+        count = kept.get(session_id, 0)
+        if count >= cap:
+            continue
+        shingles = _shingles(message['content'])
+        session_seen = seen.get(session_id)
+        if session_seen is None:
+            seen[session_id] = shingles
+        elif len(shingles & session_seen) > DUPLICATE_OVERLAP * len(shingles):
+            continue
+        else:
+            session_seen |= shingles
+        kept[session_id] = count + 1
+        yield message
@@ -0,0 +1,102 @@
+"""
+Persistent cache of headless Claude summaries.
+
+Summaries are keyed by a hash of everything that goes into the prompt
+(conversation content, style and date label), so a repeated request for
+the same day or range skips the Claude subprocess entirely. Entries expire
+after a week; failed calls are never cached.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.index import default_cache_dir
+
+# Seconds a cached summary stays valid
+DEFAULT_TTL = 7 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    result TEXT NOT NULL
+);
+"""
+
+
+def summary_key(*parts: str) -> str:
+    """Content-addressed cache key for a summary request"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part.encode('utf-8', 'surrogatepass'))
+        # Separator so ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed key -> summary dict store with a time-to-live"""
+
+    def __init__(self, db_path: Optional[Path] = None, ttl: float = DEFAULT_TTL):
+        self.db_path = db_path or default_cache_dir() / 'summaries.db'
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database lazily; disable the cache if it can't be opened"""
+        if self._conn is not None or self._disabled:
+            return self._conn
+
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"Summary cache unavailable ({self.db_path}): {e}")
+            self._disabled = True
+
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached summary for key, or None if missing or expired"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute('SELECT created, result FROM summaries WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Summary cache read failed: {e}")
+                return None
+
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        try:
+            return json.loads(row[1])
+        except ValueError:
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a summary and drop expired entries"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            now = time.time()
+            try:
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO summaries(key, created, result) VALUES (?, ?, ?)',
+                                 (key, now, json.dumps(result)))
+                    conn.execute('DELETE FROM summaries WHERE created < ?', (now - self.ttl,))
+            except sqlite3.Error as e:
+                self.logger.warning(f"Summary cache write failed: {e}")
@@ -6,26 +6,31 @@ Provides tools for analyzing Claude Code conversation sessions across all projec
 """
 
 import sys
-import json
 import asyncio
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable
 
 # MCP imports
 import mcp.types as types
 from mcp.server.lowlevel import Server
 import mcp.server.stdio
 
+try:
+    import uvloop
+except ImportError:  # optional speedup
+    uvloop = None
+
 # Local imports
-from core.searcher import SessionSearcher
+from core.jsonl import dumps
+from core.searcher import default_searcher
 from core.summarizer import ConversationSummarizer
 
 # Initialize server
 app = Server("cc-session-search")
 
 # Initialize components
-searcher = SessionSearcher()
-summarizer = ConversationSummarizer()
+searcher = default_searcher()
+summarizer = ConversationSummarizer(searcher)
 
 @app.list_tools()
 async def list_tools() -> list[types.Tool]:
@@ -76,7 +81,7 @@ async def list_tools() -> list[types.Tool]:
         ),
         types.Tool(
             name="search_conversations",
-            description="Search conversations for specific terms with context windows, role filtering, and time ranges",
+            description="Search conversations for specific terms with context windows, role filtering, and time ranges. total_matches counts matches in the sessions scanned before max_results was reached; when truncated is true, more matches may exist",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -85,6 +90,8 @@ async def list_tools() -> list[types.Tool]:
                     "days_back": {"type": "integer", "description": "Days back to search (max 7)", "default": 2},
                     "project_filter": {"type": "string", "description": "Optional filter to specific project"},
                     "case_sensitive": {"type": "boolean", "description": "Case sensitive search", "default": False},
+                    "max_results": {"type": "integer", "description": "Stop searching after this many matches, newest sessions first (max 100)", "default": 20},
+                    "regex": {"type": "boolean", "description": "Treat the query as a regular expression instead of a literal phrase (slower: can't use the search index)", "default": False},
                     "role_filter": {"type": "string", "description": "Filter messages by role (user, assistant, both, tool)", "default": "both"},
                     "start_time": {"type": "string", "description": "Start time in ISO format (e.g., '2025-09-13T08:00:00'). If specified, will search from this time forward"},
                     "end_time": {"type": "string", "description": "End time in ISO format (e.g., '2025-09-13T12:00:00'). If specified, will search up to this time"}
@@ -117,6 +124,19 @@ async def list_tools() -> list[types.Tool]:
                 "required": ["date"]
             }
         ),
+        types.Tool(
+            name="summarize_daily_conversations_batch",
+            description="Generate summaries for several dates and/or styles at once; the headless Claude calls run concurrently",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "dates": {"type": "array", "items": {"type": "string"}, "description": "Target dates in YYYY-MM-DD format (max 31)"},
+                    "styles": {"type": "array", "items": {"type": "string"}, "description": "Summary styles to generate for each date: 'journal', 'insights', 'stories'", "default": ["journal"]},
+                    "project_filter": {"type": "string", "description": "Optional filter to specific project"}
+                },
+                "required": ["dates"]
+            }
+        ),
         types.Tool(
             name="summarize_time_range",
             description="Generate intelligent summary of conversations for a specific time range using headless Claude analysis",
@@ -133,101 +153,92 @@ async def list_tools() -> list[types.Tool]:
         )
     ]
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict[str, Any]) -> list[types.ContentBlock]:
-    """Handle tool calls."""
-    if name == "list_projects":
-        projects = searcher.discover_projects()
-        result = json.dumps(projects, indent=2)
-        return [types.TextContent(type="text", text=result)]
-
-    elif name == "list_sessions":
-        project_name = arguments["project_name"]
-        days_back = min(arguments.get("days_back", 7), 7)
-        sessions = searcher.get_sessions_for_project(project_name, days_back)
-        result = json.dumps(sessions, indent=2)
-        return [types.TextContent(type="text", text=result)]
-
-    elif name == "list_recent_sessions":
-        days_back = min(arguments.get("days_back", 1), 7)
-        project_filter = arguments.get("project_filter")
-        sessions = searcher.get_recent_sessions(days_back, project_filter)
-        result = json.dumps(sessions, indent=2)
-        return [types.TextContent(type="text", text=result)]
-
-    elif name == "analyze_sessions":
-        days_back = min(arguments.get("days_back", 1), 7)
-        role_filter = arguments.get("role_filter", "both")
-        if role_filter not in ["user", "assistant", "both", "tool"]:
-            role_filter = "both"
-        project_filter = arguments.get("project_filter")
-        include_tools = arguments.get("include_tools", False)
-
-        result_data = searcher.analyze_sessions(
-            days_back=days_back,
-            role_filter=role_filter,
-            project_filter=project_filter,
-            include_tools=include_tools
-        )
-        result = json.dumps(result_data, indent=2)
-        return [types.TextContent(type="text", text=result)]
-
-    elif name == "search_conversations":
-        query = arguments["query"]
-        context_window = min(arguments.get("context_window", 1), 5)
-        days_back = min(arguments.get("days_back", 7), 7)
-        project_filter = arguments.get("project_filter")
-        case_sensitive = arguments.get("case_sensitive", False)
-        role_filter = arguments.get("role_filter", "both")
-        start_time = arguments.get("start_time")
-        end_time = arguments.get("end_time")
-
-        # Validate role_filter
-        if role_filter not in ["user", "assistant", "both", "tool"]:
-            role_filter = "both"
-
-        result_data = searcher.search_conversations(
-            query=query,
-            context_window=context_window,
-            days_back=days_back,
-            project_filter=project_filter,
-            case_sensitive=case_sensitive,
-            role_filter=role_filter,
-            start_time=start_time,
-            end_time=end_time
-        )
-        result = json.dumps(result_data, indent=2)
-        return [types.TextContent(type="text", text=result)]
+def _role_filter(arguments: dict[str, Any]) -> str:
+    """role_filter argument, falling back to "both" for unknown values"""
+    role_filter = arguments.get("role_filter", "both")
+    if role_filter not in ["user", "assistant", "both", "tool"]:
+        role_filter = "both"
+    return role_filter
+
+def _list_sessions(arguments: dict[str, Any]) -> Any:
+    days_back = min(arguments.get("days_back", 7), 7)
+    return searcher.get_sessions_for_project(arguments["project_name"], days_back)
+
+def _list_recent_sessions(arguments: dict[str, Any]) -> Any:
+    days_back = min(arguments.get("days_back", 1), 7)
+    return searcher.get_recent_sessions(days_back, arguments.get("project_filter"))
+
+def _analyze_sessions(arguments: dict[str, Any]) -> Any:
+    return searcher.analyze_sessions(
+        days_back=min(arguments.get("days_back", 1), 7),
+        role_filter=_role_filter(arguments),
+        project_filter=arguments.get("project_filter"),
+        include_tools=arguments.get("include_tools", False)
+    )
+
+def _search_conversations(arguments: dict[str, Any]) -> Any:
+    return searcher.search_conversations(
+        query=arguments["query"],
+        context_window=min(arguments.get("context_window", 1), 5),
+        days_back=min(arguments.get("days_back", 7), 7),
+        project_filter=arguments.get("project_filter"),
+        case_sensitive=arguments.get("case_sensitive", False),
+        role_filter=_role_filter(arguments),
+        start_time=arguments.get("start_time"),
+        end_time=arguments.get("end_time"),
+        max_results=max(min(arguments.get("max_results", 20), 100), 1),
+        regex=arguments.get("regex", False)
+    )
 
-    elif name == "get_message_details":
-        session_id = arguments["session_id"]
-        message_indices = arguments.get("message_indices", [])[:10]  # Limit to 10
+def _get_message_details(arguments: dict[str, Any]) -> Any:
+    message_indices = arguments.get("message_indices", [])[:10]  # Limit to 10
+    return searcher.get_message_details(arguments["session_id"], message_indices)
 
-        result_data = searcher.get_message_details(session_id, message_indices)
-        result = json.dumps(result_data, indent=2)
-        return [types.TextContent(type="text", text=result)]
+async def _summarize_daily_conversations(arguments: dict[str, Any]) -> Any:
+    return await summarizer.summarize_daily_conversations(
+        arguments["date"], arguments.get("style", "journal"), arguments.get("project_filter"))
 
-    elif name == "summarize_daily_conversations":
-        date = arguments["date"]
-        style = arguments.get("style", "journal")
-        project_filter = arguments.get("project_filter")
+async def _summarize_daily_conversations_batch(arguments: dict[str, Any]) -> Any:
+    dates = arguments["dates"][:31]  # Limit to a month
+    styles = arguments.get("styles") or ["journal"]
+    return await summarizer.summarize_daily_conversations_batch(dates, styles, arguments.get("project_filter"))
 
-        result_data = summarizer.summarize_daily_conversations(date, style, project_filter)
-        result = json.dumps(result_data, indent=2)
-        return [types.TextContent(type="text", text=result)]
+async def _summarize_time_range(arguments: dict[str, Any]) -> Any:
+    return await summarizer.summarize_time_range(
+        arguments["start_time"], arguments["end_time"],
+        arguments.get("style", "journal"), arguments.get("project_filter"))
 
-    elif name == "summarize_time_range":
-        start_time = arguments["start_time"]
-        end_time = arguments["end_time"]
-        style = arguments.get("style", "journal")
-        project_filter = arguments.get("project_filter")
+# Blocking searcher calls; call_tool runs them on a worker thread
+_SEARCH_HANDLERS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "list_projects": lambda arguments: searcher.discover_projects(),
+    "list_sessions": _list_sessions,
+    "list_recent_sessions": _list_recent_sessions,
+    "analyze_sessions": _analyze_sessions,
+    "search_conversations": _search_conversations,
+    "get_message_details": _get_message_details,
+}
 
-        result_data = summarizer.summarize_time_range(start_time, end_time, style, project_filter)
-        result = json.dumps(result_data, indent=2)
-        return [types.TextContent(type="text", text=result)]
+# Summaries wait on headless Claude and offload their own searches
+_SUMMARY_HANDLERS: dict[str, Callable[[dict[str, Any]], Awaitable[Any]]] = {
+    "summarize_daily_conversations": _summarize_daily_conversations,
+    "summarize_daily_conversations_batch": _summarize_daily_conversations_batch,
+    "summarize_time_range": _summarize_time_range,
+}
 
+@app.call_tool()
+async def call_tool(name: str, arguments: dict[str, Any]) -> list[types.ContentBlock]:
+    """Handle tool calls."""
+    handler = _SEARCH_HANDLERS.get(name)
+    if handler is not None:
+        result_data = await asyncio.to_thread(handler, arguments)
     else:
-        raise ValueError(f"Unknown tool: {name}")
+        summary_handler = _SUMMARY_HANDLERS.get(name)
+        if summary_handler is None:
+            raise ValueError(f"Unknown tool: {name}")
+        result_data = await summary_handler(arguments)
+
+    result = await asyncio.to_thread(dumps, result_data)
+    return [types.TextContent(type="text", text=result)]
 
 async def run():
     """Run the server using stdio transport."""
@@ -239,4 +250,7 @@ async def run():
         )
 
 if __name__ == "__main__":
-    asyncio.run(run())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(run())
+    else:
+        asyncio.run(run())
\ No newline at end of file
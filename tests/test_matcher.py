@@ -0,0 +1,51 @@
+"""
+Case-insensitive literal matching must give the same results with and
+without Hyperscan, using the same casefolding as the search index.
+"""
+import unittest
+
+from core import searcher
+from core.index import fold_text
+
+CONTENTS = [
+    'Straße closed',
+    'plain ascii text',
+    'the Kelvin sign',
+    'ſtrange long s',
+    'MIXED Case Words',
+]
+
+# (query, indices of CONTENTS that contain it after casefolding)
+CASES = [
+    ('STRASSE', [0]),
+    ('strasse', [0]),
+    ('kelvin', [2]),
+    ('STRANGE', [3]),
+    ('mixed case', [4]),
+    ('missing', []),
+]
+
+
+class CaseInsensitiveMatcherTest(unittest.TestCase):
+
+    def check_backend(self, use_hyperscan: bool):
+        for query, expected in CASES:
+            with self.subTest(query=query, hyperscan=use_hyperscan):
+                matcher = searcher._LiteralMatcher(query, case_sensitive=False)
+                if not use_hyperscan:
+                    matcher.db = None
+                self.assertEqual(matcher.matching_indices(CONTENTS), expected)
+                # The index folds the same way, so it offers these messages too
+                self.assertEqual([i for i, content in enumerate(CONTENTS)
+                                  if fold_text(query) in fold_text(content)], expected)
+
+    def test_str_find(self):
+        self.check_backend(use_hyperscan=False)
+
+    @unittest.skipIf(searcher.hyperscan is None, 'hyperscan is not installed')
+    def test_hyperscan(self):
+        self.check_backend(use_hyperscan=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Regression check for the raw-bytes prefilter in _scan_session_file.
+
+Skipping a file because its JSONL bytes lack the query is only safe for
+queries that JSON encoders write verbatim; queries with backslashes,
+quotes or digits must still find every match an unfiltered scan would.
+"""
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from core import searcher
+from core.conversation_parser import JSONLParser
+
+CONTENTS = [
+    'Logs are in C:\\Users\\dev\\AppData',
+    'She said "hi" and left',
+    "it's a path: /home/user/it's",
+    'flag was True in the config',
+    'first line\nsecond line',
+    'plain text with über and naïve',
+]
+
+# Content fields as raw JSON, for values the parser re-renders with str()
+RAW_CONTENTS = [
+    '[{"type": "tool_result", "content": 1e5}]',
+    '[{"type": "tool_result", "content": 0.50}]',
+    '[{"type": "tool_result", "content": -Infinity}]',
+    '[{"type": "tool_result", "content": NaN}]',
+]
+
+QUERIES = ['C:\\Users', '\\dev', 'said "hi"', '"', "it's", "'", 'True', 'line\nsecond', 'über', 'plain text',
+           '100000.0', '1e5', '0.5', '-inf', 'nan']
+
+
+class RawPrefilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.environ['XDG_CACHE_HOME'] = self.tmp.name
+        self.addCleanup(os.environ.pop, 'XDG_CACHE_HOME', None)
+        searcher._get_session_cache.cache_clear()
+        self.addCleanup(searcher._get_session_cache.cache_clear)
+
+        self.session_file = Path(self.tmp.name) / 'session.jsonl'
+        raw_contents = [json.dumps(content) for content in CONTENTS] + RAW_CONTENTS
+        with open(self.session_file, 'w') as f:
+            for i, raw_content in enumerate(raw_contents):
+                record = json.dumps({
+                    'uuid': f'uuid-{i}',
+                    'type': 'user',
+                    'sessionId': 'session',
+                    'timestamp': f'2025-09-13T08:00:{i:02d}Z',
+                    'message': {'role': 'user', 'content': None}
+                })
+                f.write(record.replace('"content": null', f'"content": {raw_content}') + '\n')
+
+    def test_prefiltered_scan_matches_unfiltered(self):
+        _, messages = JSONLParser().parse_conversation_file(self.session_file)
+        for query in QUERIES:
+            with self.subTest(query=query):
+                searcher._parse_cache.clear()
+                match_count, _ = searcher._scan_session_file(
+                    self.session_file, query, True, 'both', None, None, 0)
+                expected = sum(query in msg.content for msg in messages)
+                self.assertEqual(match_count, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()